@@ -1,24 +1,43 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
+import hashlib
 import os
 
-from backend.models import User
+from backend.cache import MISSING, TTLCache
+from backend.models import User, Profile
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
 
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
 
-if JWT_SECRET_KEY is None or ACCESS_TOKEN_EXPIRE_MINUTES is None:
-    raise ValueError("Error: .env variables not loaded. Check .env file location and names.")
+if not JWT_SECRET_KEY or not ACCESS_TOKEN_EXPIRE_MINUTES:
+    raise ValueError("Error: .env variables not loaded. Check .env file location and names (see backend/.env.example).")
 
 ACCESS_TOKEN_EXPIRE_MINUTES = int(ACCESS_TOKEN_EXPIRE_MINUTES)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Tokens minted by the admin dashboard for the /admin routes; never accepted as a user token
+ADMIN_SCOPE = "admin"
+ADMIN_TOKEN_EXPIRE_MINUTES = 5
+
+# user_id -> Principal (or None for a deleted user), so authenticated routes skip the user
+# lookup. Invalidated by PUT /profile and the admin dashboard's user edits and deletes;
+# PRINCIPAL_CACHE_TTL_S bounds how long another worker may still accept a revoked token.
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_S = float(os.getenv("PRINCIPAL_CACHE_TTL_S", "30"))
+principal_cache = TTLCache("principal", PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_S)
+
+# bcrypt cost factor for new hashes; existing hashes with a different cost are
+# rehashed the next time their user logs in (see verify_and_update)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -26,6 +45,10 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new hash or None); a new hash is returned when the stored one uses another BCRYPT_ROUNDS."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -33,15 +56,74 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     token = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm="HS256")
     return token
 
+def password_version(hashed_password: str) -> str:
+    """Short fingerprint of the stored hash; changes whenever the password does."""
+    return hashlib.sha256(hashed_password.encode("utf-8")).hexdigest()[:16]
+
+def create_user_token(user_id: int, email: str, hashed_password: str) -> str:
+    return create_access_token(data={"sub": email, "uid": user_id, "pwv": password_version(hashed_password)})
+
+def decode_user_claims(token: str) -> Optional[dict]:
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=["HS256"])
+    except JWTError:
+        return None
+    if payload.get("sub") is None or payload.get("scope") == ADMIN_SCOPE:
+        return None
+    return payload
+
 def decode_access_token(token: str):
+    claims = decode_user_claims(token)
+    return claims["sub"] if claims else None
+
+def create_admin_token():
+    return create_access_token(
+        data={"sub": "admin", "scope": ADMIN_SCOPE},
+        expires_delta=timedelta(minutes=ADMIN_TOKEN_EXPIRE_MINUTES)
+    )
+
+def is_admin_token(token: str) -> bool:
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=["HS256"])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
+        return payload.get("scope") == ADMIN_SCOPE
     except JWTError:
+        return False
+
+@dataclass(frozen=True)
+class Principal:
+    user_id: int
+    email: str
+    name: str
+    language: Optional[str]
+    password_version: str
+
+def load_principal(db: Session, user_id: Optional[int] = None, email: Optional[str] = None) -> Optional[Principal]:
+    query = db.query(User, Profile.language).outerjoin(Profile, Profile.user_id == User.id)
+    row = query.filter(User.id == user_id if user_id is not None else User.email == email).first()
+    if not row:
+        return None
+    user, language = row
+    return Principal(user.id, user.email, user.name, language, password_version(user.password))
+
+async def resolve_principal(db: Session, token: str) -> Optional[Principal]:
+    """
+    The user behind an access token, or None if the token is invalid, the user was
+    deleted or the password changed since the token was issued (pwv claim mismatch).
+    """
+    claims = decode_user_claims(token)
+    if claims is None:
+        return None
+    user_id = claims.get("uid")
+    if user_id is None:
+        # Issued before tokens carried uid/pwv; valid until it expires
+        return await run_in_threadpool(load_principal, db, email=claims["sub"])
+    principal = principal_cache.get(user_id)
+    if principal is MISSING:
+        principal = await run_in_threadpool(load_principal, db, user_id=user_id)
+        principal_cache.set(user_id, principal)
+    if principal is None or principal.password_version != claims.get("pwv"):
         return None
+    return principal
 
 def authenticate_user(db: Session, email: str, password: str):
     user = db.query(User).filter(User.email == email).first()
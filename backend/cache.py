@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable
+
+from backend.metrics import CACHE_ENTRIES, CACHE_EVICTIONS, CACHE_REQUESTS
+
+MISSING = object()
+
+# name -> cache, for GET /admin/cache and POST /admin/cache/invalidate
+caches: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """
+    In-process LRU cache whose entries also expire ttl seconds after they were set.
+    Thread-safe, so sync routes in the threadpool and async routes can share one.
+    Each uvicorn worker has its own copy: an invalidation reaches the worker that
+    handled it, and the TTL bounds how stale the others can be.
+    get() returns MISSING (not None) on a miss, so None can be cached.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        caches[name] = self
+        CACHE_ENTRIES.set(0, cache=name)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Any:
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                value = entry[1]
+            else:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                value = MISSING
+        CACHE_REQUESTS.inc(cache=self.name, result="miss" if value is MISSING else "hit")
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        evicted = 0
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+            self.evictions += evicted
+            size = len(self._data)
+        if evicted:
+            CACHE_EVICTIONS.inc(evicted, cache=self.name)
+        CACHE_ENTRIES.set(size, cache=self.name)
+
+    def invalidate(self, keys: Iterable[Hashable]) -> int:
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    removed += 1
+            size = len(self._data)
+        CACHE_ENTRIES.set(size, cache=self.name)
+        return removed
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._data)
+            self._data.clear()
+        CACHE_ENTRIES.set(0, cache=self.name)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+        }
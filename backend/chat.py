@@ -0,0 +1,286 @@
+import asyncio
+import json
+import os
+import time
+import traceback
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from backend.cache import MISSING, TTLCache
+from backend.fast_path import fast_path_router
+from backend.metrics import stage_timer
+from backend.models import ChatHistory, Profile, User
+from backend.rasa_client import RasaClientError, RasaReplyError, rasa_client
+from backend.write_behind import chat_writer
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+
+# POST /predict_chat/batch: largest accepted batch and default fan-out towards Rasa.
+# Rasa calls also pass the global RASA_MAX_CONCURRENCY limit, shared with live traffic.
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "64"))
+
+# user_id -> 'en'/'hi', or None when the profile has no language. Invalidated by PUT /profile and the admin dashboard's user edits;
+# PROFILE_CACHE_TTL_S bounds staleness in other workers. 0 disables the cache.
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL_S = float(os.getenv("PROFILE_CACHE_TTL_S", "300"))
+profile_language_cache = TTLCache("profile_language", PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_S)
+
+LANGUAGE_MAP = {"english": "en", "hindi": "hi"}
+
+NO_ANSWER = {"en": "Sorry, I don't know the answer.", "hi": "माफ़ करें, जानकारी उपलब्ध नहीं है।"}
+BACKEND_ERROR = {"en": "Backend error. Please try again.", "hi": "सर्वर त्रुटि। कृपया बाद में प्रयास करें।"}
+UNREACHABLE = {
+    "en": "Backend not reachable. Please try again later.",
+    "hi": "सर्वर उपलब्ध नहीं है। कृपया बाद में प्रयास करें।",
+}
+
+
+def profile_language_key(language: Optional[str]) -> Optional[str]:
+    return LANGUAGE_MAP.get(language.lower()) if language else None
+
+
+def rasa_metadata(profile_language: Optional[str]) -> Dict[str, Any]:
+    """
+    Message metadata for Rasa. The profile language is only sent when the user set one:
+    the action server treats it as authoritative, and without it detects the language
+    of the message.
+    """
+    return {"profile_language": profile_language} if profile_language else {}
+
+
+async def get_profile_language(db: Session, user_id: int) -> Optional[str]:
+    """'en'/'hi' from the user's profile, None if unset. Served from profile_language_cache when possible."""
+    with stage_timer("profile_lookup"):
+        cached = profile_language_cache.get(user_id)
+        if cached is not MISSING:
+            return cached
+        language = await run_in_threadpool(
+            lambda: db.query(Profile.language).filter(Profile.user_id == user_id).scalar()
+        )
+    key = profile_language_key(language)
+    profile_language_cache.set(user_id, key)
+    return key
+
+
+async def get_profile_languages(db: Session, user_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+    """get_profile_language for many users; the ones not cached are read in one query."""
+    languages = {}
+    missing = set()
+    for user_id in set(user_ids):
+        cached = profile_language_cache.get(user_id)
+        if cached is MISSING:
+            missing.add(user_id)
+        else:
+            languages[user_id] = cached
+    if missing:
+        profiles = dict(await run_in_threadpool(
+            lambda: db.query(Profile.user_id, Profile.language).filter(Profile.user_id.in_(missing)).all()
+        ))
+        for user_id in missing:
+            languages[user_id] = profile_language_key(profiles.get(user_id))
+            profile_language_cache.set(user_id, languages[user_id])
+    return languages
+
+
+def message_text(msg: Dict[str, Any], language_key: str) -> str:
+    """Text of one Rasa bot message; bilingual {"en":..., "hi":...} texts are resolved."""
+    if isinstance(msg.get("text"), dict):
+        return msg["text"].get(language_key, msg["text"].get("en", NO_ANSWER["en"]))
+    return msg.get("text", "")
+
+
+def intent_and_entities(parse_data: Optional[Dict[str, Any]]) -> Tuple[str, Optional[str]]:
+    """(intent name, JSON-encoded entities or None) for the chat_history row."""
+    if not parse_data:
+        return "unknown_intent", None
+    intent_tag = (parse_data.get("intent") or {}).get("name", "unknown_intent")
+    entities = parse_data.get("entities", [])
+    return intent_tag, json.dumps(entities) if entities else None
+
+
+async def save_chat_history(db: Session, new_chat: ChatHistory) -> None:
+    def save_chat():
+        try:
+            db.add(new_chat)
+            db.commit()
+            db.refresh(new_chat)
+        except Exception:
+            db.rollback()
+            print("Warning: Could not save chat history.")
+            traceback.print_exc()
+
+    # write_behind: only the enqueue is timed; group_commit: includes waiting for the batch
+    with stage_timer("chat_history_save"):
+        if chat_writer.enabled:
+            try:
+                await chat_writer.add(new_chat)
+            except Exception:
+                print("Warning: Could not save chat history.")
+        else:
+            await run_in_threadpool(save_chat)
+
+
+async def chat_reply(user_id: int, message: str, profile_language: Optional[str]) -> Tuple[str, str, Optional[str]]:
+    """One message through the fast path or Rasa: (response text, intent, JSON-encoded entities or None)."""
+    language_key = profile_language or "en"
+    routed = fast_path_router.route(message, language_key)
+    if routed is not None:
+        return routed.text, routed.intent, None
+
+    webhook, parse_data = await rasa_client.exchange(
+        str(user_id), message, metadata=rasa_metadata(profile_language)
+    )
+
+    response_text = ""
+    try:
+        if isinstance(webhook, Exception):
+            raise webhook
+        status, data = webhook
+        if status == 200:
+            if data:
+                response_text = "\n".join(message_text(msg, language_key) for msg in data).strip()
+            else:
+                response_text = NO_ANSWER[language_key]
+        else:
+            response_text = BACKEND_ERROR[language_key]
+    except RasaClientError:
+        response_text = UNREACHABLE[language_key]
+    except RasaReplyError:
+        response_text = BACKEND_ERROR[language_key]
+
+    intent_tag, entity_data = intent_and_entities(parse_data)
+    return response_text, intent_tag, entity_data
+
+
+async def chat_turn_events(db: Session, user_id: int, message: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    One chat turn as a stream of events, shared by the SSE and WebSocket endpoints:
+      {"type": "message", "text": ...}   each bot message, as soon as Rasa emits it
+      {"type": "meta", "intent": ..., "entities": [...]}
+      {"type": "done", "response": ..., "intent": ...}   after the turn is saved
+    """
+    profile_language = await get_profile_language(db, user_id)
+    language_key = profile_language or "en"
+
+    texts = []
+    failure_text = None
+    parse_data = None
+    routed = fast_path_router.route(message, language_key)
+    if routed is not None:
+        texts.append(routed.text)
+        parse_data = routed.parse_data
+        yield {"type": "message", "text": routed.text}
+    else:
+        async for kind, value in rasa_client.stream_exchange(str(user_id), message, rasa_metadata(profile_language)):
+            if kind == "message":
+                text = message_text(value, language_key)
+                if text:
+                    texts.append(text)
+                    yield {"type": "message", "text": text}
+            elif kind == "status":
+                failure_text = BACKEND_ERROR[language_key]
+            elif kind == "error":
+                failure_text = (BACKEND_ERROR if isinstance(value, RasaReplyError) else UNREACHABLE)[language_key]
+            elif kind == "nlu":
+                parse_data = value
+
+    if not texts:
+        texts.append(failure_text or NO_ANSWER[language_key])
+        yield {"type": "message", "text": texts[0]}
+    response_text = "\n".join(texts).strip()
+
+    intent_tag, entity_data = intent_and_entities(parse_data)
+    yield {"type": "meta", "intent": intent_tag, "entities": json.loads(entity_data) if entity_data else []}
+
+    await save_chat_history(db, ChatHistory(
+        user_id=user_id,
+        query=message,
+        response=response_text,
+        intent=intent_tag,
+        entity=entity_data,
+        timestamp=datetime.utcnow()
+    ))
+    yield {"type": "done", "response": response_text, "intent": intent_tag}
+
+
+async def batch_events(db: Session, items: List[Tuple[int, str]], concurrency: int = BATCH_CONCURRENCY,
+                       save_history: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Answer many (user_id, message) pairs, at most `concurrency` at a time, yielding
+    {"type": "result", "index": ..., "user_id": ..., "response": ..., "intent": ...}
+    in completion order, then one {"type": "summary", ...}. Profile languages are read
+    in one query, and the history rows are inserted in one transaction once every item
+    is answered (not at all if the client goes away first). The summary lists the indexes
+    of items whose row could not be saved (e.g. an unknown user_id) under "rejected".
+    """
+    started = time.perf_counter()
+    languages = await get_profile_languages(db, (user_id for user_id, _ in items))
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def answer(index: int, user_id: int, message: str):
+        async with slots:
+            reply = await chat_reply(user_id, message, languages[user_id])
+        return index, user_id, message, reply, datetime.utcnow()
+
+    tasks = [asyncio.ensure_future(answer(index, user_id, message))
+             for index, (user_id, message) in enumerate(items)]
+    rows = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, user_id, message, (response_text, intent_tag, entity_data), answered_at = await next_done
+            rows.append((index, ChatHistory(user_id=user_id, query=message, response=response_text,
+                                            intent=intent_tag, entity=entity_data, timestamp=answered_at)))
+            yield {"type": "result", "index": index, "user_id": user_id,
+                   "response": response_text, "intent": intent_tag}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    saved = 0
+    rejected: List[int] = []
+    if save_history and rows:
+        def save_batch():
+            valid = rows
+            try:
+                # A row of an unknown user fails the foreign key (on PostgreSQL) and would roll
+                # back the whole batch, so those rows are left out up front
+                user_ids = {row.user_id for _, row in rows}
+                known = {user_id for user_id, in db.query(User.id).filter(User.id.in_(user_ids))}
+                rejected.extend(index for index, row in rows if row.user_id not in known)
+                valid = [(index, row) for index, row in rows if row.user_id in known]
+                db.bulk_save_objects([row for _, row in valid])
+                db.commit()
+                return len(valid)
+            except OperationalError:
+                db.rollback()
+                print("Warning: Could not save batch chat history.")
+                traceback.print_exc()
+                rejected[:] = [index for index, _ in rows]
+                return 0
+            except Exception:
+                db.rollback()
+                print("Warning: Could not save batch chat history, saving it row by row.")
+                traceback.print_exc()
+            # Another constraint failed: save what can be saved, one transaction per row
+            count = 0
+            for index, row in valid:
+                try:
+                    db.bulk_save_objects([row])
+                    db.commit()
+                    count += 1
+                except Exception:
+                    db.rollback()
+                    rejected.append(index)
+            return count
+
+        with stage_timer("chat_history_save"):
+            saved = await run_in_threadpool(save_batch)
+    yield {"type": "summary", "items": len(items), "saved": saved, "rejected": sorted(rejected),
+           "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
@@ -0,0 +1,168 @@
+import difflib
+import os
+import random
+import re
+import unicodedata
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+from dotenv import load_dotenv
+
+from backend.metrics import FAST_PATH_REQUESTS, stage_timer
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Greetings, goodbyes and mood check-ins are answered from a phrase table built from the
+# Rasa training data, without the NLU pipeline, the webhook or the action server.
+# A message is routed when it matches a training example after normalization
+# (confidence 1.0) or is at least FAST_PATH_MIN_CONFIDENCE similar to one (difflib ratio);
+# everything else goes to Rasa. 1.0 means exact matches only.
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() in ("1", "true", "yes")
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.9"))
+FAST_PATH_NLU = os.getenv("FAST_PATH_NLU", os.path.join(ROOT, "rasabot", "data", "nlu.yml"))
+FAST_PATH_DOMAIN = os.getenv("FAST_PATH_DOMAIN", os.path.join(ROOT, "rasabot", "domain.yml"))
+
+# Intents answered by action_mood_response, which only picks utter_<intent>_<en|hi>
+ROUTED_INTENTS = ("greeting", "goodbye")
+ROUTED_INTENT_PREFIX = "mood_"
+LANGUAGES = ("en", "hi")
+# Near misses down to this similarity are still looked up, so wellbot_fast_path_total
+# shows how many messages a lower gate would take
+CANDIDATE_FLOOR = 0.75
+
+# A fuzzy match must agree with its table phrase on these: "I am not feeling very good"
+# is 0.92 similar to the mood_great example "I am feeling very good". Spelled as they are
+# after normalize() (apostrophes dropped, repeats collapsed).
+NEGATIONS = frozenset(("not", "no", "never", "dont", "didnt", "doesnt", "cant", "isnt", "arent", "wasnt",
+                       "nothing", "nahi", "नहीं", "नही", "ना", "न", "मत"))
+
+_REPEATS_RE = re.compile(r"(.)\1+")
+_SPACES_RE = re.compile(r"\s+")
+_ANNOTATION_RE = re.compile(r"\[([^\]]+)\](?:\([^)]*\)|\{[^}]*\})")
+
+
+def normalize(text: str) -> str:
+    """
+    Casefolded, punctuation/emoji removed, repeated characters collapsed ("Hiii!!" -> "hi"),
+    single-spaced. Applied to the table and to messages alike, so the collapsing only
+    has to be consistent, not linguistically right.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    chars = []
+    for char in text:
+        if char in "'’":
+            continue
+        category = unicodedata.category(char)
+        # P*: punctuation incl. the danda; S*: symbols and emoji. Devanagari vowel
+        # signs are M*, so they are kept.
+        chars.append(" " if category[0] in "PS" else char)
+    text = _REPEATS_RE.sub(r"\1", "".join(chars))
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+class FastPathMatch(NamedTuple):
+    intent: str
+    confidence: float
+    text: str
+
+    @property
+    def parse_data(self) -> Dict[str, Any]:
+        """Shaped like Rasa's /model/parse result, for intent_and_entities()."""
+        return {"intent": {"name": self.intent, "confidence": self.confidence}, "entities": []}
+
+
+class FastPathRouter:
+    """
+    Normalized-phrase table -> intent, plus the bilingual responses per intent. Phrases
+    that appear under two intents are left out, so they always go to Rasa.
+    """
+
+    def __init__(self, min_confidence: float = FAST_PATH_MIN_CONFIDENCE, enabled: bool = FAST_PATH_ENABLED):
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+        self.phrases: Dict[str, str] = {}
+        self.responses: Dict[str, Dict[str, List[str]]] = {}
+        self._keys: List[str] = []
+        self._max_length = 0
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.phrases)
+
+    def load(self, nlu_path: str = FAST_PATH_NLU, domain_path: str = FAST_PATH_DOMAIN) -> None:
+        if not self.enabled:
+            return
+        try:
+            with open(nlu_path, "r", encoding="utf-8") as f:
+                nlu = yaml.safe_load(f) or {}
+            with open(domain_path, "r", encoding="utf-8") as f:
+                domain = yaml.safe_load(f) or {}
+        except OSError as e:
+            print(f"Warning: fast path disabled, could not read the Rasa training data: {e}")
+            return
+        self.build(nlu, domain)
+
+    def build(self, nlu: Dict[str, Any], domain: Dict[str, Any]) -> None:
+        templates = domain.get("responses") or {}
+        responses = {}
+        examples: Dict[str, set] = {}
+        for block in nlu.get("nlu") or []:
+            intent = block.get("intent")
+            if not intent or not (intent in ROUTED_INTENTS or intent.startswith(ROUTED_INTENT_PREFIX)):
+                continue
+            texts = {
+                language: [r["text"] for r in templates.get(f"utter_{intent}_{language}") or [] if r.get("text")]
+                for language in LANGUAGES
+            }
+            if not all(texts.values()):
+                continue
+            responses[intent] = texts
+            for line in (block.get("examples") or "").splitlines():
+                line = line.strip()
+                if line.startswith("- "):
+                    phrase = normalize(_ANNOTATION_RE.sub(r"\1", line[2:]))
+                    if phrase:
+                        examples.setdefault(phrase, set()).add(intent)
+
+        self.responses = responses
+        self.phrases = {phrase: intents.pop() for phrase, intents in examples.items() if len(intents) == 1}
+        self._keys = list(self.phrases)
+        self._max_length = max(map(len, self._keys), default=0)
+
+    def match(self, message: str) -> Optional[Tuple[str, float]]:
+        """(intent, confidence) of the closest table phrase, or None."""
+        text = normalize(message)
+        if not text:
+            return None
+        intent = self.phrases.get(text)
+        if intent is not None:
+            return intent, 1.0
+        # Exact matches only; or a ratio of CANDIDATE_FLOOR is impossible past this length
+        if self.min_confidence >= 1.0 or len(text) > self._max_length * 2:
+            return None
+        close = difflib.get_close_matches(text, self._keys, n=1, cutoff=min(self.min_confidence, CANDIDATE_FLOOR))
+        if not close or NEGATIONS.intersection(text.split()) != NEGATIONS.intersection(close[0].split()):
+            return None
+        return self.phrases[close[0]], round(difflib.SequenceMatcher(None, text, close[0]).ratio(), 3)
+
+    def route(self, message: str, language_key: str) -> Optional[FastPathMatch]:
+        """The reply for a trivial message, or None if it has to go to Rasa."""
+        if not self.enabled or not self.loaded:
+            return None
+        with stage_timer("fast_path"):
+            found = self.match(message)
+        if found is None:
+            FAST_PATH_REQUESTS.inc(result="no_match")
+            return None
+        intent, confidence = found
+        if confidence < self.min_confidence:
+            FAST_PATH_REQUESTS.inc(result="below_gate")
+            return None
+        FAST_PATH_REQUESTS.inc(result="answered")
+        texts = self.responses[intent]
+        return FastPathMatch(intent, confidence, random.choice(texts.get(language_key) or texts["en"]))
+
+
+fast_path_router = FastPathRouter()
@@ -0,0 +1,54 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from backend.models import ChatHistory
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "100"))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(row: ChatHistory) -> str:
+    """Opaque cursor for the position right after `row` (newest-first order)."""
+    payload = json.dumps({"ts": row.timestamp.isoformat(), "id": row.id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["ts"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def fetch_history_page(db: Session, user_id: int, limit: int = HISTORY_PAGE_SIZE,
+                       cursor: Optional[str] = None) -> Tuple[List[ChatHistory], Optional[str]]:
+    """
+    One page of a user's chat history, newest first, plus the cursor for the next (older) page.
+    Keyset pagination on (timestamp, id) walks ix_chat_history_user_id_timestamp_id, so every
+    page costs the same however much history the user has. limit is clamped to HISTORY_MAX_PAGE_SIZE.
+    """
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    query = db.query(ChatHistory).filter(ChatHistory.user_id == user_id)
+    if cursor:
+        ts, last_id = decode_cursor(cursor)
+        # (timestamp, id) < (ts, last_id), written so the timestamp bound is an index range
+        query = query.filter(and_(
+            ChatHistory.timestamp <= ts,
+            or_(ChatHistory.timestamp < ts, ChatHistory.id < last_id),
+        ))
+    rows = query.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
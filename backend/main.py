@@ -1,21 +1,46 @@
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 import requests
 import os
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 
 from backend.routes import router
-from backend.db import engine, Base, get_db
+from backend.db import get_db
+from backend.fast_path import fast_path_router
+from backend.metrics import CHAT_WRITE_QUEUE_DEPTH, CONTENT_TYPE, MetricsMiddleware, registry
+from backend.migrate import upgrade_database
 from backend.models import User, ChatHistory, Profile
+from backend.passwords import password_hasher
+from backend.rasa_client import rasa_client
+from backend.write_behind import chat_writer
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
 RASA_URL = os.getenv("RASA_URL", "http://127.0.0.1:5005/webhooks/rest/webhook")
+# With several uvicorn workers, run `python -m backend.migrate` once and set this to false
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
 
-app = FastAPI(title="WellBot Backend")
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        await run_in_threadpool(upgrade_database)
+    await run_in_threadpool(fast_path_router.load)
+    await rasa_client.start()
+    if chat_writer.enabled:
+        chat_writer.start()
+    yield
+    await rasa_client.close()
+    await run_in_threadpool(chat_writer.stop)
+    password_hasher.shutdown()
+
+app = FastAPI(title="WellBot Backend", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 app.include_router(router)
 
+CHAT_WRITE_QUEUE_DEPTH.set_function(chat_writer.queue_depth)
+
 @app.get("/")
 def read_root():
     return {"message": "Hello, FastAPI is running!"}
@@ -24,6 +49,14 @@ def read_root():
 def ping():
     return {"status": "ok", "message": "pong!"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus text exposition of the request, chat-stage, Rasa and DB pool metrics.
+    Served on the event loop, so a scrape is not queued behind a saturated threadpool.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 class ChatRequest(BaseModel):
     user_id: int
     message: str
@@ -0,0 +1,283 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Seconds; covers a cached profile lookup (sub-millisecond) up to a Rasa timeout
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; set_function() makes it read a callback at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f"{self.name} {_format_value(self._function())}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram. An observation is one bisect and three increments under a
+    per-metric lock; cumulative bucket counts are only computed when /metrics is scraped.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1], series[2])) for key, series in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "wellbot_http_request_duration_seconds", "Time to serve an HTTP request, by route template.",
+    ("method", "route", "status")))
+HTTP_REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    "wellbot_http_requests_in_flight", "HTTP requests currently being served."))
+STAGE_DURATION = registry.register(Histogram(
+    "wellbot_stage_duration_seconds",
+    "Time spent in each stage of a chat turn (profile_lookup, fast_path, rasa_webhook, rasa_parse, chat_history_save).",
+    ("stage",)))
+RASA_ERRORS = registry.register(Counter(
+    "wellbot_rasa_errors_total", "Failed Rasa calls that were not timeouts (connection errors, non-200 or non-JSON replies).",
+    ("endpoint", "reason")))
+RASA_TIMEOUTS = registry.register(Counter(
+    "wellbot_rasa_timeouts_total", "Rasa calls that hit RASA_TIMEOUT.", ("endpoint",)))
+RASA_CIRCUIT_STATE = registry.register(Gauge(
+    "wellbot_rasa_circuit_state", "Rasa circuit breaker state: 0 closed, 1 half-open, 2 open."))
+RASA_REJECTED = registry.register(Counter(
+    "wellbot_rasa_rejected_total", "Rasa calls not sent (circuit_open, queue_timeout); answered with the fallback.",
+    ("reason",)))
+RASA_QUEUE_WAIT = registry.register(Histogram(
+    "wellbot_rasa_queue_wait_seconds", "Time a Rasa call waited for a RASA_MAX_CONCURRENCY slot.",
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)))
+RASA_QUEUE_WAITING = registry.register(Gauge(
+    "wellbot_rasa_queue_waiting", "Rasa calls currently waiting for a concurrency slot."))
+RASA_HEDGES = registry.register(Counter(
+    "wellbot_rasa_parse_hedges_total", "Hedged /model/parse requests sent, and how many answered first.",
+    ("outcome",)))
+FAST_PATH_REQUESTS = registry.register(Counter(
+    "wellbot_fast_path_total", "Chat messages checked by the fast-path router (answered, below_gate, no_match).",
+    ("result",)))
+CACHE_REQUESTS = registry.register(Counter(
+    "wellbot_cache_requests_total", "In-process cache lookups by result (hit, miss).", ("cache", "result")))
+CACHE_EVICTIONS = registry.register(Counter(
+    "wellbot_cache_evictions_total", "Entries dropped because the cache was full.", ("cache",)))
+CACHE_ENTRIES = registry.register(Gauge(
+    "wellbot_cache_entries", "Entries currently held by each in-process cache.", ("cache",)))
+PASSWORD_HASH_QUEUE_WAIT = registry.register(Histogram(
+    "wellbot_password_hash_queue_wait_seconds", "Time a bcrypt hash or verify waited for a PASSWORD_HASH_WORKERS thread.",
+    buckets=(0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)))
+PASSWORD_HASH_DURATION = registry.register(Histogram(
+    "wellbot_password_hash_duration_seconds", "Time spent in bcrypt, by operation (hash, verify).", ("op",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)))
+PASSWORD_HASH_QUEUED = registry.register(Gauge(
+    "wellbot_password_hash_queued", "bcrypt operations waiting for a thread."))
+PASSWORD_HASH_REJECTED = registry.register(Counter(
+    "wellbot_password_hash_rejected_total", "Logins and registrations refused with 503 (queue_full, queue_timeout).",
+    ("reason",)))
+DB_POOL_WAIT = registry.register(Histogram(
+    "wellbot_db_pool_wait_seconds", "Time spent waiting to check a connection out of the database pool.",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)))
+DB_POOL_CHECKED_OUT = registry.register(Gauge(
+    "wellbot_db_pool_checked_out", "Database connections currently checked out of the pool."))
+CHAT_WRITE_QUEUE_DEPTH = registry.register(Gauge(
+    "wellbot_chat_write_queue_depth", "Rows waiting in the write-behind queue (CHAT_WRITE_MODE)."))
+
+
+def stage_timer(stage: str):
+    """`with stage_timer("rasa_parse"): ...` records the block in wellbot_stage_duration_seconds."""
+    return STAGE_DURATION.time(stage=stage)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and the in-flight gauge. Routes are
+    labelled by their path template ("/history", not "/history?cursor=..."), and
+    unmatched paths share one label, so the number of series stays bounded.
+    Streaming responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", None) or "unmatched",
+                status=str(status["code"]),
+            )
@@ -0,0 +1,30 @@
+import os
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+
+from backend.db import DATABASE_URL
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "alembic.ini")
+
+
+def alembic_config(url: Optional[str] = None) -> Config:
+    cfg = Config(ALEMBIC_INI)
+    cfg.set_main_option("sqlalchemy.url", (url or DATABASE_URL).replace("%", "%%"))
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def upgrade_database(url: Optional[str] = None, revision: str = "head") -> None:
+    """
+    Bring the schema at `url` (default DATABASE_URL) up to `revision`.
+    Existing tables and rows are kept; a database made by the old create_all()
+    is adopted by the initial revision and then gets the later ones.
+    """
+    command.upgrade(alembic_config(url), revision)
+
+
+if __name__ == "__main__":
+    upgrade_database()
+    print(f"Database at {DATABASE_URL} is up to date.")
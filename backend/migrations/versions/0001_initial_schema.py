@@ -0,0 +1,92 @@
+"""Initial schema (users, profiles, chat_history, feedback).
+
+Databases created by the old Base.metadata.create_all() already have these tables;
+they are left untouched and only stamped with this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Offline (--sql) runs cannot inspect the database and emit the full schema
+    existing = set() if context.is_offline_mode() else set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("password", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_id", "users", ["id"], unique=False)
+
+    if "profiles" not in existing:
+        op.create_table(
+            "profiles",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("age_group", sa.String(), nullable=True),
+            sa.Column("gender", sa.String(), nullable=True),
+            sa.Column("language", sa.String(), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("user_id"),
+        )
+        op.create_index("ix_profiles_id", "profiles", ["id"], unique=False)
+
+    if "chat_history" not in existing:
+        op.create_table(
+            "chat_history",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("query", sa.String(), nullable=False),
+            sa.Column("response", sa.String(), nullable=False),
+            sa.Column("intent", sa.String(), nullable=True),
+            sa.Column("entity", sa.String(), nullable=True),
+            sa.Column("timestamp", sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_chat_history_id", "chat_history", ["id"], unique=False)
+
+    if "feedback" not in existing:
+        op.create_table(
+            "feedback",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("user_query", sa.String(), nullable=False),
+            sa.Column("bot_response", sa.String(), nullable=False),
+            sa.Column("feedback", sa.String(), nullable=False),
+            sa.Column("timestamp", sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_feedback_id", "feedback", ["id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("feedback")
+    op.drop_table("chat_history")
+    op.drop_table("profiles")
+    op.drop_table("users")
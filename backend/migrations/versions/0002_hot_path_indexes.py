@@ -0,0 +1,36 @@
+"""Indexes for per-user history, intent analytics and feedback listing.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A user's history ordered by time; the user_id prefix also serves per-user deletes
+    op.create_index("ix_chat_history_user_id_timestamp", "chat_history", ["user_id", "timestamp"], unique=False)
+    # Intent distribution / filtering in the admin dashboard
+    op.create_index("ix_chat_history_intent", "chat_history", ["intent"], unique=False)
+    # Positive-feedback counts and the newest-first feedback list
+    op.create_index("ix_feedback_feedback", "feedback", ["feedback"], unique=False)
+    op.create_index("ix_feedback_timestamp", "feedback", ["timestamp"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_feedback_timestamp", table_name="feedback")
+    op.drop_index("ix_feedback_feedback", table_name="feedback")
+    op.drop_index("ix_chat_history_intent", table_name="chat_history")
+    op.drop_index("ix_chat_history_user_id_timestamp", table_name="chat_history")
@@ -0,0 +1,32 @@
+"""Cover the (timestamp, id) keyset of GET /history in the per-user history index.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_chat_history_user_id_timestamp_id", "chat_history", ["user_id", "timestamp", "id"], unique=False
+    )
+    # Every query the old index served is a prefix of the new one
+    op.drop_index("ix_chat_history_user_id_timestamp", table_name="chat_history")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_chat_history_user_id_timestamp", "chat_history", ["user_id", "timestamp"], unique=False)
+    op.drop_index("ix_chat_history_user_id_timestamp_id", table_name="chat_history")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from .db import Base
@@ -47,6 +47,11 @@ class ChatHistory(Base):
 
     user = relationship("User", back_populates="chat_history")
 
+    __table_args__ = (
+        Index("ix_chat_history_user_id_timestamp_id", "user_id", "timestamp", "id"),
+        Index("ix_chat_history_intent", "intent"),
+    )
+
 class Feedback(Base):
     __tablename__ = "feedback"
 
@@ -57,4 +62,9 @@ class Feedback(Base):
     feedback = Column(String, nullable=False) 
     timestamp = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+    __table_args__ = (
+        Index("ix_feedback_feedback", "feedback"),
+        Index("ix_feedback_timestamp", "timestamp"),
+    )
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+from backend.metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_QUEUE_WAIT, PASSWORD_HASH_QUEUED, PASSWORD_HASH_REJECTED
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+
+# bcrypt gets its own threads so a burst of logins cannot take the threadpool that
+# sync routes and the chat pipeline's database calls run on. Operations beyond
+# PASSWORD_HASH_MAX_QUEUE waiting ones, or that waited longer than
+# PASSWORD_HASH_QUEUE_TIMEOUT seconds for a thread, are refused (503) instead of hashed late.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5"))
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes queued; the request should be retried later."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt calls on a dedicated, size-limited thread pool. bcrypt releases the GIL,
+    so the workers use other cores while the event loop keeps serving chat. Waiting time
+    and queue length are exported as wellbot_password_hash_* metrics.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+                 queue_timeout: float = PASSWORD_HASH_QUEUE_TIMEOUT):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0  # queued + running; only touched on the event loop
+
+    @property
+    def queued(self) -> int:
+        return max(0, self._pending - self.workers)
+
+    async def run(self, op: str, function: Callable[..., T], *args) -> T:
+        if self._pending >= self.workers + self.max_queue:
+            PASSWORD_HASH_REJECTED.inc(reason="queue_full")
+            raise PasswordHasherBusy(f"{self._pending} password hashes in progress")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        submitted = time.perf_counter()
+
+        def timed() -> T:
+            started = time.perf_counter()
+            PASSWORD_HASH_QUEUE_WAIT.observe(started - submitted)
+            # The client has most likely given up by now; do not spend a bcrypt on it
+            if self.queue_timeout > 0 and started - submitted > self.queue_timeout:
+                PASSWORD_HASH_REJECTED.inc(reason="queue_timeout")
+                raise PasswordHasherBusy(f"waited {started - submitted:.1f}s for a password hash thread")
+            with PASSWORD_HASH_DURATION.time(op=op):
+                return function(*args)
+
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
+PASSWORD_HASH_QUEUED.set_function(lambda: password_hasher.queued)
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import aiohttp
+from dotenv import load_dotenv
+
+from backend.metrics import RASA_ERRORS, RASA_TIMEOUTS, STAGE_DURATION, stage_timer
+from backend.resilience import (
+    RASA_PARSE_HEDGE_MS, CircuitBreaker, ConcurrencyLimiter, RasaUnavailable, hedged
+)
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+
+RASA_URL = os.getenv("RASA_URL", "http://127.0.0.1:5005/webhooks/rest/webhook")
+_rasa_base = urlsplit(RASA_URL)
+RASA_PARSE_URL = os.getenv("RASA_PARSE_URL", f"{_rasa_base.scheme}://{_rasa_base.netloc}/model/parse")
+
+# serial:     webhook, then /model/parse (two NLU passes, one after the other)
+# concurrent: webhook and /model/parse at the same time (two NLU passes, one round trip)
+# metadata:   intent/entities come from the "nlu" custom message the actions append to the
+#             webhook reply (one NLU pass); /model/parse is only called if it is missing
+RASA_PIPELINE_MODE = os.getenv("RASA_PIPELINE_MODE", "serial")
+PIPELINE_MODES = ("serial", "concurrent", "metadata")
+
+RASA_POOL_LIMIT = int(os.getenv("RASA_POOL_LIMIT", "200"))
+RASA_POOL_LIMIT_PER_HOST = int(os.getenv("RASA_POOL_LIMIT_PER_HOST", "0"))
+RASA_KEEPALIVE_TIMEOUT = float(os.getenv("RASA_KEEPALIVE_TIMEOUT", "30"))
+RASA_TIMEOUT = float(os.getenv("RASA_TIMEOUT", "5"))
+RASA_CONNECT_TIMEOUT = float(os.getenv("RASA_CONNECT_TIMEOUT", "2"))
+
+# Raised for connection failures and timeouts, like requests.exceptions.RequestException was,
+# and when the circuit breaker or concurrency limit keeps a call from being sent
+RasaClientError = (aiohttp.ClientError, asyncio.TimeoutError, RasaUnavailable)
+# Raised when a 200 reply is not JSON (a proxy's error page, a truncated stream line).
+# Counted as invalid_reply and as a breaker failure, and answered with BACKEND_ERROR.
+RasaReplyError = (ValueError,)
+
+WebhookResult = Union[Tuple[int, Any], Exception]
+
+
+def record_failure(endpoint: str, error: Optional[BaseException] = None, status: Optional[int] = None) -> None:
+    """Count a failed Rasa call in wellbot_rasa_timeouts_total / wellbot_rasa_errors_total."""
+    if isinstance(error, RasaUnavailable):
+        return  # counted in wellbot_rasa_rejected_total
+    if isinstance(error, asyncio.TimeoutError):
+        RASA_TIMEOUTS.inc(endpoint=endpoint)
+    elif error is not None:
+        RASA_ERRORS.inc(endpoint=endpoint, reason="connection" if isinstance(error, aiohttp.ClientError) else "invalid_reply")
+    elif status is not None and status != 200:
+        RASA_ERRORS.inc(endpoint=endpoint, reason="status")
+
+
+def split_nlu_metadata(messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Separate the actions' {"custom": {"nlu": ...}} message from the messages shown to the user."""
+    nlu = None
+    visible = []
+    for msg in messages or []:
+        custom = msg.get("custom")
+        if isinstance(custom, dict) and "nlu" in custom:
+            nlu = custom["nlu"]
+        else:
+            visible.append(msg)
+    return visible, nlu
+
+
+class RasaClient:
+    """
+    One keep-alive aiohttp session shared by every chat request.
+    Connections to Rasa are pooled (RASA_POOL_LIMIT) instead of opened per call.
+    Every call passes a circuit breaker and a concurrency limit (backend/resilience.py),
+    so an unhealthy Rasa is answered with the fallback at once instead of after RASA_TIMEOUT.
+    """
+
+    def __init__(self, url: str = RASA_URL, parse_url: str = RASA_PARSE_URL,
+                 pipeline_mode: str = RASA_PIPELINE_MODE, pool_limit: int = RASA_POOL_LIMIT,
+                 pool_limit_per_host: int = RASA_POOL_LIMIT_PER_HOST,
+                 timeout: float = RASA_TIMEOUT, connect_timeout: float = RASA_CONNECT_TIMEOUT,
+                 breaker: Optional[CircuitBreaker] = None, limiter: Optional[ConcurrencyLimiter] = None,
+                 parse_hedge_ms: float = RASA_PARSE_HEDGE_MS):
+        if pipeline_mode not in PIPELINE_MODES:
+            raise ValueError(f"RASA_PIPELINE_MODE must be one of {PIPELINE_MODES}, got {pipeline_mode!r}")
+        self.url = url
+        self.parse_url = parse_url
+        self.pipeline_mode = pipeline_mode
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter or ConcurrencyLimiter()
+        self.parse_hedge_delay = parse_hedge_ms / 1000.0
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=RASA_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @asynccontextmanager
+    async def _guard(self):
+        """Circuit breaker and concurrency limit around one call; the caller reports the status."""
+        self.breaker.before_call()
+        try:
+            async with self.limiter:
+                yield
+        except RasaUnavailable:
+            self.breaker.release()
+            raise
+        except RasaClientError + RasaReplyError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+
+    def _record_status(self, status: int) -> None:
+        if status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    async def _post(self, url: str, payload: Dict[str, Any]) -> Tuple[int, Any]:
+        if self._session is None or self._session.closed:
+            await self.start()
+        async with self._guard():
+            async with self._session.post(url, json=payload) as resp:
+                data = await resp.json(content_type=None) if resp.status == 200 else None
+                status = resp.status
+        self._record_status(status)
+        return status, data
+
+    async def send_message(self, sender: str, message: str,
+                           metadata: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+        """POST to the REST channel webhook; returns (status, list of bot messages)."""
+        payload = {"sender": sender, "message": message, "metadata": metadata or {}}
+        return await self._post(self.url, payload)
+
+    async def parse(self, text: str, sender: str) -> Tuple[int, Any]:
+        """POST to /model/parse; returns (status, parse result). Hedged after RASA_PARSE_HEDGE_MS if set."""
+        payload = {"text": text, "sender": sender}
+        return await hedged(lambda: self._post(self.parse_url, payload), self.parse_hedge_delay)
+
+    async def _webhook(self, sender: str, message: str, metadata: Optional[Dict[str, Any]]) -> WebhookResult:
+        try:
+            with stage_timer("rasa_webhook"):
+                result = await self.send_message(sender, message, metadata)
+        except RasaClientError + RasaReplyError as e:
+            record_failure("webhook", e)
+            return e
+        record_failure("webhook", status=result[0])
+        return result
+
+    async def _nlu(self, sender: str, message: str) -> Optional[Dict[str, Any]]:
+        try:
+            with stage_timer("rasa_parse"):
+                status, parse_data = await self.parse(message, sender)
+            record_failure("parse", status=status)
+            return parse_data if status == 200 else None
+        except Exception as e:
+            record_failure("parse", e)
+            if not isinstance(e, RasaUnavailable):
+                print(f"[WARN] Could not fetch intent/entities: {e}")
+            return None
+
+    async def exchange(self, sender: str, message: str,
+                       metadata: Optional[Dict[str, Any]] = None) -> Tuple[WebhookResult, Optional[Dict[str, Any]]]:
+        """
+        Send a user message and get its intent/entities according to pipeline_mode.
+        Returns the webhook result ((status, visible messages), or the connection error or invalid reply)
+        and the NLU result ({"intent": ..., "entities": ...} or None).
+        """
+        if self.pipeline_mode == "concurrent":
+            webhook, nlu = await asyncio.gather(
+                self._webhook(sender, message, metadata), self._nlu(sender, message)
+            )
+        else:
+            webhook = await self._webhook(sender, message, metadata)
+            nlu = None
+            if self.pipeline_mode == "metadata" and not isinstance(webhook, Exception) and webhook[0] == 200:
+                visible, nlu = split_nlu_metadata(webhook[1])
+                webhook = (webhook[0], visible)
+            # If the webhook could not reach Rasa, /model/parse would only wait for the same failure
+            if nlu is None and not isinstance(webhook, Exception):
+                nlu = await self._nlu(sender, message)
+
+        if not isinstance(webhook, Exception) and webhook[0] == 200:
+            webhook = (webhook[0], split_nlu_metadata(webhook[1])[0])
+        return webhook, nlu
+
+    async def stream_exchange(self, sender: str, message: str,
+                              metadata: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming variant of exchange() using the REST channel's ?stream=true mode.
+        Yields ("message", msg) for each visible bot message as Rasa emits it, then
+        ("nlu", parse result or None). A non-200 reply yields ("status", code) and a
+        connection failure or invalid reply ("error", exc) before the final "nlu" item.
+        """
+        nlu_task = None
+        if self.pipeline_mode == "concurrent":
+            nlu_task = asyncio.ensure_future(self._nlu(sender, message))
+        nlu = None
+        webhook_failed = False
+        try:
+            if self._session is None or self._session.closed:
+                await self.start()
+            payload = {"sender": sender, "message": message, "metadata": metadata or {}}
+            started = time.perf_counter()
+            try:
+                async with self._guard():
+                    async with self._session.post(self.url, params={"stream": "true"}, json=payload) as resp:
+                        record_failure("webhook", status=resp.status)
+                        self._record_status(resp.status)
+                        if resp.status != 200:
+                            yield "status", resp.status
+                        else:
+                            async for line in resp.content:
+                                line = line.strip()
+                                if not line:
+                                    continue
+                                visible, msg_nlu = split_nlu_metadata([json.loads(line)])
+                                if msg_nlu is not None:
+                                    nlu = msg_nlu
+                                for msg in visible:
+                                    yield "message", msg
+            except RasaClientError + RasaReplyError as e:
+                record_failure("webhook", e)
+                webhook_failed = True
+                yield "error", e
+            # Until the last line arrived (includes the time the consumer took per message)
+            STAGE_DURATION.observe(time.perf_counter() - started, stage="rasa_webhook")
+
+            if nlu_task is not None:
+                nlu = await nlu_task
+            elif not webhook_failed and (self.pipeline_mode != "metadata" or nlu is None):
+                nlu = await self._nlu(sender, message)
+            yield "nlu", nlu
+        finally:
+            if nlu_task is not None and not nlu_task.done():
+                nlu_task.cancel()
+
+
+rasa_client = RasaClient()
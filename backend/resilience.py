@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+from backend.metrics import RASA_CIRCUIT_STATE, RASA_HEDGES, RASA_QUEUE_WAIT, RASA_QUEUE_WAITING, RASA_REJECTED
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+
+# Circuit breaker: open after this many consecutive failures, probe again after the reset time
+RASA_BREAKER_FAILURES = int(os.getenv("RASA_BREAKER_FAILURES", "5"))
+RASA_BREAKER_RESET_S = float(os.getenv("RASA_BREAKER_RESET_S", "10"))
+# Concurrent calls to Rasa (0 = unlimited) and how long a call may queue for a slot
+RASA_MAX_CONCURRENCY = int(os.getenv("RASA_MAX_CONCURRENCY", "64"))
+RASA_QUEUE_TIMEOUT = float(os.getenv("RASA_QUEUE_TIMEOUT", "2"))
+# Send a second /model/parse if the first has not answered after this long (0 = no hedging)
+RASA_PARSE_HEDGE_MS = float(os.getenv("RASA_PARSE_HEDGE_MS", "0"))
+
+T = TypeVar("T")
+
+
+class RasaUnavailable(Exception):
+    """The call was not sent to Rasa; callers answer with the localized fallback."""
+
+
+class CircuitOpenError(RasaUnavailable):
+    pass
+
+
+class RasaOverloaded(RasaUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    closed:    calls go through; failure_threshold failures in a row open the circuit
+    open:      calls fail at once with CircuitOpenError for reset_timeout seconds
+    half_open: one probe call goes through; success closes the circuit, failure re-opens it
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold: int = RASA_BREAKER_FAILURES,
+                 reset_timeout: float = RASA_BREAKER_RESET_S, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._set_state(self.CLOSED)
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        RASA_CIRCUIT_STATE.set(self._STATE_VALUES[state])
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go to Rasa now."""
+        if not self.enabled or self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN:
+            if self._clock() - self.opened_at < self.reset_timeout:
+                RASA_REJECTED.inc(reason="circuit_open")
+                raise CircuitOpenError("Rasa circuit is open")
+            self._set_state(self.HALF_OPEN)
+        # half-open: let exactly one probe through
+        if self._probe_in_flight:
+            RASA_REJECTED.inc(reason="circuit_open")
+            raise CircuitOpenError("Rasa circuit is half-open, probe in flight")
+        self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probe_in_flight = False
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.enabled and self.failures >= self.failure_threshold):
+            self.opened_at = self._clock()
+            if self.state != self.OPEN:
+                print(f"[WARN] Rasa circuit opened after {self.failures} consecutive failures")
+            self._set_state(self.OPEN)
+
+    def release(self) -> None:
+        """The call ended without a verdict (e.g. it was cancelled); free the probe slot."""
+        self._probe_in_flight = False
+
+
+class ConcurrencyLimiter:
+    """
+    Caps in-flight calls to Rasa with an asyncio.Semaphore, so a slow Rasa cannot tie up
+    every request. Time spent waiting for a slot goes to wellbot_rasa_queue_wait_seconds;
+    a call that waits longer than queue_timeout fails with RasaOverloaded.
+    """
+
+    def __init__(self, limit: int = RASA_MAX_CONCURRENCY, queue_timeout: float = RASA_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        if self.limit <= 0:
+            return self
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        start = time.perf_counter()
+        RASA_QUEUE_WAITING.inc()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            RASA_REJECTED.inc(reason="queue_timeout")
+            raise RasaOverloaded(f"no Rasa slot free within {self.queue_timeout}s") from None
+        finally:
+            RASA_QUEUE_WAITING.dec()
+            RASA_QUEUE_WAIT.observe(time.perf_counter() - start)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._semaphore is not None and self.limit > 0:
+            self._semaphore.release()
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay: float) -> T:
+    """
+    Run call(); if it has not finished after delay seconds, start a second copy and
+    return whichever succeeds first, cancelling the other. Only for idempotent calls.
+    """
+    if delay <= 0:
+        return await call()
+    first = asyncio.ensure_future(call())
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return first.result()
+
+        RASA_HEDGES.inc(outcome="sent")
+        second = asyncio.ensure_future(call())
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        RASA_HEDGES.inc(outcome="won")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,86 +1,135 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import datetime
 import json
 from pathlib import Path
-import traceback
-import requests, os
+import os
 
+from starlette.concurrency import run_in_threadpool
 
-from backend.db import get_db
+
+from backend.db import SessionLocal, get_db
 from backend.models import User, Profile, ChatHistory
-from backend.schemas import UserCreate, UserLogin, ProfileBase, PredictChatRequest, PredictChatResponse
-from backend.auth import hash_password, verify_password, create_access_token, decode_access_token
+from backend.schemas import UserCreate, UserLogin, ProfileBase, PredictChatRequest, PredictChatResponse, PredictChatBatchRequest
+from backend.auth import (
+    Principal, hash_password, verify_and_update, create_user_token, is_admin_token, principal_cache, resolve_principal
+)
+from backend.passwords import PasswordHasherBusy, password_hasher
 from dotenv import load_dotenv
 from backend.models import Feedback
 from backend.schemas import FeedbackCreate, FeedbackResponse
+from backend.write_behind import chat_writer
+from backend.cache import caches
+from backend.chat import (
+    BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS, batch_events, chat_reply,
+    chat_turn_events, get_profile_language, profile_language_cache, save_chat_history
+)
+from backend.schemas import CacheInvalidateRequest, HistoryPage
+from backend.history import HISTORY_MAX_PAGE_SIZE, HISTORY_PAGE_SIZE, InvalidCursor, fetch_history_page
 
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
-RASA_URL = os.getenv("RASA_URL", "http://127.0.0.1:5005/webhooks/rest/webhook")
 router = APIRouter()
 
 #Auth Routes
+async def hash_on_executor(op: str, function, *args):
+    try:
+        return await password_hasher.run(op, function, *args)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Too many logins in progress, try again shortly",
+                            headers={"Retry-After": "1"})
+
 @router.post("/register")
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    def email_taken() -> bool:
+        taken = db.query(User.id).filter(User.email == user.email).first() is not None
+        db.rollback()  # hand the connection back to the pool while the password is hashed
+        return taken
+
+    if await run_in_threadpool(email_taken):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = hash_password(user.password)
-    new_user = User(name=user.name, email=user.email, password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    hashed_password = await hash_on_executor("hash", hash_password, user.password)
 
-    new_profile = Profile(user_id=new_user.id)
-    db.add(new_profile)
-    db.commit()
+    def save_user() -> int:
+        new_user = User(name=user.name, email=user.email, password=hashed_password)
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+
+        new_profile = Profile(user_id=new_user.id)
+        db.add(new_profile)
+        db.commit()
+        return new_user.id
 
-    return {"message": "User registered successfully", "user_id": new_user.id}
+    user_id = await run_in_threadpool(save_user)
+    return {"message": "User registered successfully", "user_id": user_id}
 
 @router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def login(user: UserLogin, db: Session = Depends(get_db)):
+    def find_user():
+        row = db.query(User.id, User.password).filter(User.email == user.email).first()
+        db.rollback()  # hand the connection back to the pool while the password is checked
+        return row
+
+    db_user = await run_in_threadpool(find_user)
     if not db_user:
         raise HTTPException(status_code=404, detail="Email not registered. Please register first.")
-    if not verify_password(user.password, db_user.password):
+    valid, new_hash = await hash_on_executor("verify", verify_and_update, user.password, db_user.password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid password")
 
-    token = create_access_token(data={"sub": db_user.email})
+    hashed_password = db_user.password
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made. The new hash has a new pwv,
+        # so the user's other sessions are signed out like after a password change.
+        def save_hash():
+            db.query(User).filter(User.id == db_user.id).update({User.password: new_hash})
+            db.commit()
+
+        await run_in_threadpool(save_hash)
+        principal_cache.invalidate([db_user.id])
+        hashed_password = new_hash
+
+    token = create_user_token(db_user.id, user.email, hashed_password)
     return {
         "access_token": token,
         "token_type": "bearer",
         "user_id": db_user.id
     }
 
-def get_current_user_email(authorization: Optional[str] = Header(None)):
+async def get_current_principal(
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """The logged-in user; the database is only read when principal_cache misses."""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid or missing token")
     token = authorization.split(" ")[1]
-    email = decode_access_token(token)
-    if not email:
+    principal = await resolve_principal(db, token)
+    if principal is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    return email
+    return principal
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    if not authorization or not authorization.startswith("Bearer ") or not is_admin_token(authorization.split(" ")[1]):
+        raise HTTPException(status_code=403, detail="Admin token required")
 
 #Profile Routes
 @router.get("/profile")
 def get_profile(
     db: Session = Depends(get_db),
-    email: str = Depends(get_current_user_email)
+    principal: Principal = Depends(get_current_principal)
 ):
-    db_user = db.query(User).filter(User.email == email).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    db_profile = db.query(Profile).filter(Profile.user_id == db_user.id).first()
+    db_profile = db.query(Profile).filter(Profile.user_id == principal.user_id).first()
     if not db_profile or (
         not db_profile.age_group and not db_profile.gender and not db_profile.language
     ):
         return {}
 
     return {
-        "user_id": db_user.id,
+        "user_id": principal.user_id,
         "age_group": db_profile.age_group,
         "gender": db_profile.gender,
         "language": db_profile.language
@@ -90,15 +139,11 @@ def get_profile(
 def update_profile(
     profile_data: ProfileBase,
     db: Session = Depends(get_db),
-    email: str = Depends(get_current_user_email)
+    principal: Principal = Depends(get_current_principal)
 ):
-    db_user = db.query(User).filter(User.email == email).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    db_profile = db.query(Profile).filter(Profile.user_id == db_user.id).first()
+    db_profile = db.query(Profile).filter(Profile.user_id == principal.user_id).first()
     if not db_profile:
-        db_profile = Profile(user_id=db_user.id)
+        db_profile = Profile(user_id=principal.user_id)
         db.add(db_profile)
 
     db_profile.age_group = profile_data.age_group
@@ -107,95 +152,173 @@ def update_profile(
 
     db.commit()
     db.refresh(db_profile)
+    profile_language_cache.invalidate([principal.user_id])
+    principal_cache.invalidate([principal.user_id])
+
+    return {"message": "Profile updated successfully", "user_id": principal.user_id}
 
-    return {"message": "Profile updated successfully", "user_id": db_user.id}
+#History Routes
+@router.get("/history", response_model=HistoryPage)
+def get_history(
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(get_current_principal)
+):
+    """Newest-first chat history of the logged-in user; pass next_cursor back to get older messages."""
+    try:
+        items, next_cursor = fetch_history_page(db, principal.user_id, limit, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return HistoryPage(items=items, next_cursor=next_cursor)
 
 #Chatbot Route
 @router.post("/predict_chat", response_model=PredictChatResponse)
-def predict_chat(chat: PredictChatRequest, db: Session = Depends(get_db)):
+async def predict_chat(chat: PredictChatRequest, db: Session = Depends(get_db)):
     message = chat.message
     user_id = chat.user_id
 
-    db_profile = db.query(Profile).filter(Profile.user_id == user_id).first()
-    language_map = {"english": "en", "hindi": "hi"}
-    language_key = "en" 
+    profile_language = await get_profile_language(db, user_id)
+    response_text, intent_tag, entity_data = await chat_reply(user_id, message, profile_language)
 
-    if db_profile and db_profile.language:
-        language_key = language_map.get(db_profile.language.lower(), "en")
-
-    response_text = ""
-    try:
-        payload = {
-            "sender": str(user_id),
-            "message": message,
-            "metadata": {"language": language_key}  
-        }
-        rasa_resp = requests.post(RASA_URL, json=payload, timeout=5)
-        if rasa_resp.status_code == 200:
-            data = rasa_resp.json()
-            response_texts = []
-
-            if data:
-                for msg in data:
-                    if isinstance(msg.get("text"), dict):
-                        response_texts.append(
-                            msg["text"].get(language_key, msg["text"].get("en", "Sorry, I don't know the answer."))
-                        )
-                    else:
-                        response_texts.append(msg.get("text", ""))
-
-                response_text = "\n".join(response_texts).strip()
-            else:
-                response_text = "Sorry, I don't know the answer." if language_key == "en" else "माफ़ करें, जानकारी उपलब्ध नहीं है।"
-        else:
-            response_text = "Backend error. Please try again." if language_key == "en" else "सर्वर त्रुटि। कृपया बाद में प्रयास करें।"
-    except requests.exceptions.RequestException:
-        response_text = "Backend not reachable. Please try again later." if language_key == "en" else "सर्वर उपलब्ध नहीं है। कृपया बाद में प्रयास करें।"
-
-    intent_tag = "unknown_intent"
-    entity_data = None
-    try:
-        parse_payload = {"text": message, "sender": str(user_id)}
-        rasa_parse = requests.post("http://localhost:5005/model/parse", json=parse_payload, timeout=5)
-        if rasa_parse.status_code == 200:
-            parse_data = rasa_parse.json()
-            intent_tag = parse_data.get("intent", {}).get("name", "unknown_intent")
-            entities = parse_data.get("entities", [])
-            entity_data = json.dumps(entities) if entities else None
-    except Exception as e:
-        print(f"[WARN] Could not fetch intent/entities: {e}")
-
-    try:
-        new_chat = ChatHistory(
-            user_id=user_id,
-            query=message,
-            response=response_text,
-            intent=intent_tag,
-            entity=entity_data,
-            timestamp=datetime.utcnow()
-        )
-        db.add(new_chat)
-        db.commit()
-        db.refresh(new_chat)
-    except Exception:
-        db.rollback()
-        print("Warning: Could not save chat history.")
-        traceback.print_exc()
+    await save_chat_history(db, ChatHistory(
+        user_id=user_id,
+        query=message,
+        response=response_text,
+        intent=intent_tag,
+        entity=entity_data,
+        timestamp=datetime.utcnow()
+    ))
 
     return PredictChatResponse(
         response=response_text,
         intent=intent_tag
     )
 
+@router.post("/predict_chat/stream")
+async def predict_chat_stream(chat: PredictChatRequest):
+    """
+    Server-Sent Events version of /predict_chat: one "message" event per bot message as it
+    arrives, then "meta" (intent, entities) and "done". Clients should keep the HTTP
+    connection alive (e.g. a requests.Session) and reuse it for every turn.
+    """
+    async def event_stream():
+        # Dependencies are torn down before a streaming body runs, so the session lives here
+        db = SessionLocal()
+        try:
+            async for event in chat_turn_events(db, chat.user_id, chat.message):
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        event_stream(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/predict_chat/batch", dependencies=[Depends(require_admin)])
+async def predict_chat_batch(batch: PredictChatBatchRequest):
+    """
+    Many /predict_chat turns in one request, for regression runs and traffic replay.
+    Admin only: it writes history rows for any user_id and fans out to Rasa.
+    Streams one NDJSON line per answered item (in completion order; "index" points back
+    into the request), then a summary line once the history has been committed.
+    """
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="No items to answer")
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+    concurrency = min(batch.concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    items = [(item.user_id, item.message) for item in batch.items]
+
+    async def result_stream():
+        db = SessionLocal()
+        try:
+            async for event in batch_events(db, items, concurrency, batch.save_history):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+@router.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, token: str = Query(...)):
+    """
+    Persistent chat connection. Authenticate with ?token=<access token>, then send
+    {"message": "..."} once per turn; each turn is answered with the same events as
+    /predict_chat/stream, as JSON text frames.
+    """
+    # Sessions are per turn: one held for the whole socket would keep a pooled
+    # connection checked out for as long as the chat tab stays open
+    db = SessionLocal()
+    try:
+        principal = await resolve_principal(db, token)
+    finally:
+        db.close()
+    if principal is None:
+        await websocket.close(code=1008)  # policy violation: bad or expired token
+        return
+    await websocket.accept()
+
+    try:
+        while True:
+            try:
+                payload = await websocket.receive_json()
+            except WebSocketDisconnect:
+                break
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "Expected a JSON object"})
+                continue
+            message = str(payload.get("message", "")).strip() if isinstance(payload, dict) else ""
+            if not message:
+                await websocket.send_json({"type": "error", "detail": "Empty message"})
+                continue
+            db = SessionLocal()
+            try:
+                async for event in chat_turn_events(db, principal.user_id, message):
+                    await websocket.send_json(event)
+            finally:
+                db.close()
+    except WebSocketDisconnect:
+        pass
+
 @router.post("/feedback", response_model=FeedbackResponse)
-def submit_feedback(feedback: FeedbackCreate, db: Session = Depends(get_db)):
+async def submit_feedback(feedback: FeedbackCreate, db: Session = Depends(get_db)):
     new_feedback = Feedback(
         user_id=feedback.user_id,
         user_query=feedback.user_query,
         bot_response=feedback.bot_response,
         feedback=feedback.feedback
     )
-    db.add(new_feedback)
-    db.commit()
-    db.refresh(new_feedback)
-    return new_feedback
\ No newline at end of file
+    if chat_writer.enabled:
+        # The response carries the new id, so feedback always waits for its batch
+        return await chat_writer.add(new_feedback, wait=True)
+
+    def save_feedback():
+        db.add(new_feedback)
+        db.commit()
+        db.refresh(new_feedback)
+        return new_feedback
+
+    return await run_in_threadpool(save_feedback)
+
+#Admin Routes
+@router.get("/admin/cache", dependencies=[Depends(require_admin)])
+async def cache_stats():
+    """Size and hit rate of each in-process cache (this worker only)."""
+    return {name: cache.stats() for name, cache in caches.items()}
+
+@router.post("/admin/cache/invalidate", dependencies=[Depends(require_admin)])
+async def invalidate_cache(request: CacheInvalidateRequest):
+    """Drop cached entries after the admin dashboard edits or deletes users."""
+    names = request.caches or list(caches)
+    unknown = [name for name in names if name not in caches]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown cache: {', '.join(unknown)}")
+    removed = {}
+    for name in names:
+        if request.user_ids is None:
+            removed[name] = caches[name].clear()
+        else:
+            removed[name] = caches[name].invalidate(request.user_ids)
+    return {"removed": removed}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class Token(BaseModel):
@@ -50,10 +50,29 @@ class ChatSave(BaseModel):
     intent: Optional[str] = None
     entity: Optional[str] = None 
 
+class ChatHistoryItem(BaseModel):
+    id: int
+    query: str
+    response: str
+    intent: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class HistoryPage(BaseModel):
+    items: List[ChatHistoryItem]
+    next_cursor: Optional[str] = None
+
 class PredictChatRequest(BaseModel):
     user_id: int
     message: str 
 
+class PredictChatBatchRequest(BaseModel):
+    items: List[PredictChatRequest]
+    concurrency: Optional[int] = None
+    save_history: bool = True
+
 class PredictChatResponse(BaseModel):
     response: str
     intent: str
@@ -74,3 +93,7 @@ class FeedbackResponse(BaseModel):
 
     class Config:
         orm_mode = True
+
+class CacheInvalidateRequest(BaseModel):
+    caches: Optional[List[str]] = None    # default: every cache
+    user_ids: Optional[List[int]] = None  # default: every entry
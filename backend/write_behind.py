@@ -0,0 +1,197 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import OperationalError
+from starlette.concurrency import run_in_threadpool
+
+from backend.db import SessionLocal
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), ".env"))
+
+# sync:          commit every chat/feedback row inside the request (default)
+# group_commit:  queue the row and wait until its batch is committed (durable, fewer commits)
+# write_behind:  queue the row and return at once; rows not yet flushed are lost on a crash
+CHAT_WRITE_MODE = os.getenv("CHAT_WRITE_MODE", "sync")
+CHAT_WRITE_MODES = ("sync", "group_commit", "write_behind")
+
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    Bounded in-memory queue of ORM rows, inserted by one background thread in
+    multi-row transactions of up to batch_size rows.
+    In write_behind mode a batch is collected for up to flush_ms after its first row;
+    in group_commit mode whatever is queued when the writer gets to it is committed at once.
+    When the queue is full the row is written inline, so memory stays bounded.
+    """
+
+    def __init__(self, session_factory=SessionLocal, mode: str = CHAT_WRITE_MODE,
+                 batch_size: int = WRITE_BEHIND_BATCH_SIZE, flush_ms: float = WRITE_BEHIND_FLUSH_MS,
+                 max_queue: int = WRITE_BEHIND_MAX_QUEUE):
+        if mode not in CHAT_WRITE_MODES:
+            raise ValueError(f"CHAT_WRITE_MODE must be one of {CHAT_WRITE_MODES}, got {mode!r}")
+        self.session_factory = session_factory
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.batches = 0
+        self.overflows = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "sync"
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Flush every queued row and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        print(f"[INFO] Write-behind queue stopped: {self.stats()}")
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, row: Any, wait: bool = False) -> Future:
+        """
+        Queue a row for insertion. The returned future resolves to the row once its batch
+        is committed. Rows submitted with wait=True are refreshed (id, defaults) before that.
+        """
+        if self._thread is None:
+            self.start()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((row, wait, future))
+        except queue.Full:
+            self.overflows += 1
+            self._write([(row, wait, future)])
+        return future
+
+    async def add(self, row: Any, wait: bool = False) -> Any:
+        """Queue a row from a request; waits for the commit in group_commit mode or when wait=True."""
+        if self._queue.full():
+            # The inline write would block the event loop
+            future = await run_in_threadpool(self.submit, row, wait)
+        else:
+            future = self.submit(row, wait)
+        if wait or self.mode == "group_commit":
+            return await asyncio.wrap_future(future)
+        return row
+
+    def _collect(self, first) -> Tuple[List, bool]:
+        batch = [first]
+        stop = False
+        deadline = time.monotonic() + (self.flush_interval if self.mode == "write_behind" else 0.0)
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch, stop = self._collect(item)
+            self._write(batch)
+            if stop:
+                break
+        # Drain anything queued after the stop marker
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.batch_size):
+            self._write(leftover[start:start + self.batch_size])
+
+    def _commit(self, batch: List[Tuple[Any, bool, Future]]) -> Optional[Exception]:
+        """Insert the batch in one transaction; returns the error if it was rolled back."""
+        waited = [row for row, wait, _ in batch if wait]
+        bulk = [row for row, wait, _ in batch if not wait]
+        db = self.session_factory(expire_on_commit=False)
+        try:
+            if bulk:
+                db.bulk_save_objects(bulk)
+            if waited:
+                db.add_all(waited)
+            db.commit()
+            if waited:
+                db.expunge_all()
+        except Exception as e:
+            db.rollback()
+            return e
+        finally:
+            db.close()
+        return None
+
+    def _write(self, batch: List[Tuple[Any, bool, Future]]) -> None:
+        error = self._commit(batch)
+        if error is None:
+            self.rows_written += len(batch)
+            self.batches += 1
+            for row, _, future in batch:
+                future.set_result(row)
+            return
+        # One bad row (a deleted user, a constraint) rolls back the whole transaction; split
+        # the batch until it is isolated so the other rows are still saved. An unreachable
+        # database fails every row alike, so that is not retried.
+        if len(batch) > 1 and not isinstance(error, OperationalError):
+            middle = len(batch) // 2
+            self._write(batch[:middle])
+            self._write(batch[middle:])
+            return
+        self.failures += len(batch)
+        print(f"Warning: Could not save {len(batch)} queued rows.")
+        traceback.print_exception(type(error), error, error.__traceback__)
+        for _, _, future in batch:
+            future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "queued": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "avg_batch": round(self.rows_written / self.batches, 1) if self.batches else 0.0,
+            "overflows": self.overflows,
+            "failures": self.failures,
+        }
+
+
+chat_writer = WriteBehindQueue()
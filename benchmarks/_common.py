@@ -0,0 +1,56 @@
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+RASABOT_DIR = ROOT / "rasabot"
+NLU_PATH = RASABOT_DIR / "data" / "nlu.yml"
+
+# The action server imports the actions package from inside rasabot/
+if str(RASABOT_DIR) not in sys.path:
+    sys.path.insert(0, str(RASABOT_DIR))
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def load_nlu_examples(path: Path = NLU_PATH) -> Dict[str, List[str]]:
+    """Return {intent: [example, ...]} from nlu.yml with entity annotations stripped."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    examples: Dict[str, List[str]] = {}
+    for block in data.get("nlu", []):
+        intent = block.get("intent")
+        if not intent:
+            continue
+        for line in block.get("examples", "").splitlines():
+            line = line.strip()
+            if not line.startswith("- "):
+                continue
+            text = re.sub(r"\[([^\]]+)\]\([^)]*\)", r"\1", line[2:])
+            text = re.sub(r"\[([^\]]+)\]\{[^}]*\}", r"\1", text)
+            examples.setdefault(intent, []).append(text)
+    return examples
+
+
+def time_per_call(fn: Callable[[], object], repeat: int = 5, number: int = 1) -> Dict[str, float]:
+    """Run fn number times per round, repeat rounds, and return per-call timings in microseconds."""
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number * 1e6)
+    return {"best_us": min(rounds), "median_us": statistics.median(rounds)}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
@@ -0,0 +1,109 @@
+"""
+Concurrency benchmark for a running action server (rasa run actions).
+Sends action_fetch_kb / action_mood_response requests built from nlu.yml examples
+with 1, 50 and 200 parallel senders and reports p50/p99 latency per level.
+
+    cd rasabot && rasa run actions          # in another shell
+    python -m benchmarks.bench_action_server --url http://localhost:5055/webhook
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+import aiohttp
+
+from benchmarks._common import load_nlu_examples, percentile
+
+MOOD_INTENTS = {"greeting", "goodbye", "mood_great", "mood_unhappy"}
+
+
+def action_request(sender_id: str, intent: str, text: str, language: str = None) -> dict:
+    """Webhook payload in the format Rasa sends to the action server."""
+    next_action = "action_mood_response" if intent in MOOD_INTENTS else "action_fetch_kb"
+    latest_message = {
+        "intent": {"name": intent, "confidence": 1.0},
+        "entities": [],
+        "text": text,
+        "metadata": {"profile_language": language} if language else {},
+    }
+    return {
+        "next_action": next_action,
+        "sender_id": sender_id,
+        "version": "3.6.2",
+        "domain": {"slots": {}, "responses": {}},
+        "tracker": {
+            "sender_id": sender_id,
+            "slots": {"language": None},
+            "latest_message": latest_message,
+            "latest_event_time": time.time(),
+            "followup_action": None,
+            "paused": False,
+            "events": [{"event": "user", "timestamp": time.time(), "text": text,
+                        "parse_data": latest_message}],
+            "latest_input_channel": "rest",
+            "active_loop": {},
+            "latest_action": {"action_name": "action_listen"},
+            "latest_action_name": "action_listen",
+        },
+    }
+
+
+async def run_level(url: str, samples, senders: int, requests_per_sender: int):
+    latencies = []
+    errors = 0
+    sample_iter = itertools.cycle(samples)
+    connector = aiohttp.TCPConnector(limit=senders)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def sender(idx: int):
+            nonlocal errors
+            for _ in range(requests_per_sender):
+                intent, text = next(sample_iter)
+                body = action_request(str(100000 + idx), intent, text)
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json=body) as resp:
+                        await resp.read()
+                        if resp.status != 200:
+                            errors += 1
+                except aiohttp.ClientError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(sender(i) for i in range(senders)))
+        elapsed = time.perf_counter() - start
+    return {
+        "senders": senders,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def main_async(args):
+    examples = load_nlu_examples()
+    samples = [(intent, text) for intent, texts in examples.items() for text in texts]
+    random.Random(42).shuffle(samples)
+    results = []
+    for senders in args.levels:
+        per_sender = max(1, args.requests // senders)
+        results.append(await run_level(args.url, samples, senders, per_sender))
+        print(json.dumps(results[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5055/webhook")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 50, 200])
+    parser.add_argument("--requests", type=int, default=2000, help="total requests per level")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Benchmark suite for the custom actions (needs rasa_sdk installed).
+
+Drives ActionFetchKB and ActionMoodResponse in-process with Tracker objects built
+from the nlu.yml examples, against the shipped KB and generated KBs 10x and 100x
+its size. Reports per-stage timings (KB load, match, language lookup, dispatch)
+as JSON so runs can be diffed between releases.
+
+    python -m benchmarks.bench_actions --scales 1 10 100 --output bench_actions.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks._common import load_nlu_examples, percentile
+from benchmarks.bench_action_server import MOOD_INTENTS, action_request
+
+from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
+
+import actions.actions as actions_module
+from actions.kb_bundle import build_bundle, load_bundle
+from actions.kb_store import KB_PATH, KBStore
+from actions.language import LanguageResolver
+from actions.response_cache import ResponseCache
+
+
+def scale_kb(src: Path, dst: Path, factor: int) -> None:
+    """Write each KB file with `factor` copies of every entry, with distinct ids and keywords."""
+    dst.mkdir(parents=True, exist_ok=True)
+    for kb_file in sorted(src.glob("*.json")):
+        data = json.loads(kb_file.read_text(encoding="utf-8"))
+        entries = list(data.get("entries", []))
+        for n in range(1, factor):
+            for e in data.get("entries", []):
+                entries.append({
+                    "id": f"{e['id']}_{n}",
+                    "keywords": [f"{kw} x{n}" for kw in e.get("keywords", [])],
+                    "en": e.get("en", ""),
+                    "hi": e.get("hi", ""),
+                })
+        data["entries"] = entries
+        (dst / kb_file.name).write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def make_profiles_db(path: Path, senders: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE profiles (id INTEGER PRIMARY KEY, user_id INTEGER UNIQUE, language TEXT)")
+    conn.executemany("INSERT INTO profiles (user_id, language) VALUES (?, ?)",
+                     [(i, "Hindi" if i % 3 == 0 else "English") for i in range(1, senders + 1)])
+    conn.commit()
+    conn.close()
+
+
+def summarize(samples_us):
+    return {
+        "n": len(samples_us),
+        "mean_us": round(statistics.fmean(samples_us), 2) if samples_us else 0.0,
+        "p50_us": round(percentile(samples_us, 50), 2),
+        "p99_us": round(percentile(samples_us, 99), 2),
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1e6
+
+
+async def atimed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - start) * 1e6
+
+
+async def bench_scale(kb_dir: Path, db_path: Path, samples, senders: int):
+    result = {"kb_dir": str(kb_dir)}
+
+    # KB load: JSON parse + index build, and the prebuilt bundle path
+    store = KBStore(kb_dir)
+    _, json_us = timed(store.load_all)
+    build_bundle(kb_dir)
+    bundle_store = KBStore(kb_dir)
+    _, bundle_us = timed(lambda: (load_bundle(bundle_store), bundle_store.load_all()))
+    result["entries"] = sum(len(store.get(i).entries) for i in store.intents())
+    result["kb_load"] = {"json_ms": round(json_us / 1000, 2), "bundle_ms": round(bundle_us / 1000, 2)}
+
+    actions_module.KB_STORE = store
+    actions_module.LANGUAGE_RESOLVER = LanguageResolver(db_path)
+    fetch_kb = actions_module.ActionFetchKB()
+    mood = actions_module.ActionMoodResponse()
+
+    match_us, fallback_us, lang_miss_us, lang_hit_us = [], [], [], []
+    dispatch_cold_us, dispatch_warm_us, mood_us = [], [], []
+    for i, (intent, text) in enumerate(samples):
+        sender = str(i % senders + 1)
+        tracker = Tracker.from_dict(action_request(sender, intent, text)["tracker"])
+        if intent in MOOD_INTENTS:
+            _, us = await atimed(mood.run(CollectingDispatcher(), tracker, {}))
+            mood_us.append(us)
+            continue
+
+        kb = store.get(intent)
+        entry, us = timed(fetch_kb.match_entry, tracker, kb)
+        match_us.append(us)
+        if entry is None:
+            _, us = timed(store.search_all, text.lower(), intent, 1)
+            fallback_us.append(us)
+
+        resolver = actions_module.LANGUAGE_RESOLVER
+        misses = resolver.misses
+        _, us = await atimed(resolver.aget(sender))
+        (lang_miss_us if resolver.misses > misses else lang_hit_us).append(us)
+
+        actions_module.RESPONSE_CACHE = ResponseCache(maxsize=0, log_every=0)
+        _, us = await atimed(fetch_kb.run(CollectingDispatcher(), tracker, {}))
+        dispatch_cold_us.append(us)
+
+    warm_cache = ResponseCache(log_every=0)
+    actions_module.RESPONSE_CACHE = warm_cache
+    for _ in range(2):
+        dispatch_warm_us.clear()
+        for i, (intent, text) in enumerate(samples):
+            if intent in MOOD_INTENTS:
+                continue
+            tracker = Tracker.from_dict(action_request(str(i % senders + 1), intent, text)["tracker"])
+            _, us = await atimed(fetch_kb.run(CollectingDispatcher(), tracker, {}))
+            dispatch_warm_us.append(us)
+
+    result["stages"] = {
+        "match": summarize(match_us),
+        "cross_intent_fallback": summarize(fallback_us),
+        "language_lookup_db": summarize(lang_miss_us),
+        "language_lookup_cached": summarize(lang_hit_us),
+        "dispatch_fetch_kb_uncached": summarize(dispatch_cold_us),
+        "dispatch_fetch_kb_cached": summarize(dispatch_warm_us),
+        "dispatch_mood_response": summarize(mood_us),
+    }
+    result["response_cache"] = warm_cache.stats()
+    return result
+
+
+async def main_async(args):
+    examples = load_nlu_examples()
+    samples = [(intent, text) for intent, texts in examples.items() for text in texts]
+    random.Random(42).shuffle(samples)
+    samples = samples[:args.messages]
+
+    report = {
+        "benchmark": "actions",
+        "python": platform.python_version(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "messages": len(samples),
+        "senders": args.senders,
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        db_path = tmp / "profiles.db"
+        make_profiles_db(db_path, args.senders)
+        for factor in args.scales:
+            kb_dir = tmp / f"kb_x{factor}"
+            scale_kb(KB_PATH, kb_dir, factor)
+            report["scales"][f"x{factor}"] = await bench_scale(kb_dir, db_path, samples, args.senders)
+            print(f"[bench] x{factor} done", flush=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--senders", type=int, default=200)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+End-to-end benchmark of POST /predict_chat for each RASA_PIPELINE_MODE and CHAT_WRITE_MODE.
+
+Starts benchmarks.rasa_stub in a subprocess and the backend in-process under uvicorn,
+with get_db pointed at a throwaway SQLite file so backend/wellbot.db is not touched.
+For every mode and concurrency level it reports p50/p99 latency, throughput and the
+number of NLU passes the stub served per chat message.
+
+    python -m benchmarks.bench_chat_pipeline --nlu-ms 40 --nlu-concurrency 8
+    python -m benchmarks.bench_chat_pipeline --modes metadata --write-modes sync write_behind
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+import uvicorn
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks._common import ROOT, load_nlu_examples, percentile
+
+import backend.main as backend_main
+from backend.db import get_db
+from backend.main import app
+from backend.migrate import upgrade_database
+from backend.models import Profile, User
+from backend.rasa_client import PIPELINE_MODES, rasa_client
+from backend.write_behind import CHAT_WRITE_MODES, chat_writer
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def use_temp_db(db_path: Path, users: int) -> None:
+    url = f"sqlite:///{db_path}"
+    upgrade_database(url)
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+    TempSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with TempSession() as db:
+        for i in range(1, users + 1):
+            db.add(User(id=i, name=f"bench{i}", email=f"bench{i}@example.com", password="x"))
+            db.add(Profile(user_id=i, language="Hindi" if i % 3 == 0 else "English"))
+        db.commit()
+
+    def get_temp_db():
+        db = TempSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_temp_db
+    chat_writer.session_factory = TempSession
+    # The app would otherwise migrate DATABASE_URL (backend/wellbot.db) on startup
+    backend_main.MIGRATE_ON_STARTUP = False
+
+
+async def wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port}")
+
+
+async def run_level(url: str, samples, users: int, concurrency: int, total: int):
+    latencies = []
+    errors = 0
+    sample_iter = itertools.cycle(samples)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def client(idx: int):
+            nonlocal errors
+            for n in range(max(1, total // concurrency)):
+                _, text = next(sample_iter)
+                body = {"user_id": (idx + n) % users + 1, "message": text}
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json=body) as resp:
+                        await resp.read()
+                        if resp.status != 200:
+                            errors += 1
+                except aiohttp.ClientError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def nlu_calls(stub_url: str) -> int:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{stub_url}/stats") as resp:
+            return (await resp.json())["nlu_calls"]
+
+
+async def main_async(args):
+    examples = load_nlu_examples()
+    samples = [(intent, text) for intent, texts in examples.items() for text in texts]
+    random.Random(42).shuffle(samples)
+
+    stub_port, backend_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.rasa_stub", "--port", str(stub_port),
+         "--nlu-ms", str(args.nlu_ms), "--action-ms", str(args.action_ms),
+         "--nlu-concurrency", str(args.nlu_concurrency)],
+        cwd=ROOT,
+    )
+    rasa_client.url = f"{stub_url}/webhooks/rest/webhook"
+    rasa_client.parse_url = f"{stub_url}/model/parse"
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=backend_port,
+                                           log_level="warning", access_log=False))
+    server_task = asyncio.create_task(server.serve())
+    results = []
+    try:
+        await wait_for_port(stub_port)
+        await wait_for_port(backend_port)
+        url = f"http://127.0.0.1:{backend_port}/predict_chat"
+        for write_mode in args.write_modes:
+            chat_writer.mode = write_mode
+            for mode in args.modes:
+                rasa_client.pipeline_mode = mode
+                for concurrency in args.levels:
+                    before = await nlu_calls(stub_url)
+                    result = await run_level(url, samples, args.users, concurrency, args.requests)
+                    result["mode"] = mode
+                    result["write_mode"] = write_mode
+                    result["nlu_passes_per_message"] = round(
+                        (await nlu_calls(stub_url) - before) / max(1, result["requests"]), 2)
+                    results.append(result)
+                    print(json.dumps(result), flush=True)
+            await asyncio.get_running_loop().run_in_executor(None, chat_writer.stop)
+    finally:
+        server.should_exit = True
+        await server_task
+        stub.terminate()
+        stub.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=PIPELINE_MODES, default=list(PIPELINE_MODES))
+    parser.add_argument("--write-modes", nargs="+", choices=CHAT_WRITE_MODES, default=["sync"])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 50])
+    parser.add_argument("--requests", type=int, default=500, help="total requests per level")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--nlu-ms", type=float, default=40.0)
+    parser.add_argument("--action-ms", type=float, default=10.0)
+    parser.add_argument("--nlu-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(Path(tmp) / "bench.db", args.users)
+        asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
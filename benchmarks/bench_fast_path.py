@@ -0,0 +1,89 @@
+"""
+Coverage, misroutes and speed of the fast-path router (backend/fast_path.py) at several
+confidence gates. The table is built from nlu.yml/domain.yml as the backend does; the
+message sets are:
+
+    variants   routed-intent examples with case, punctuation, emoji, elongated letters
+               and one-letter typos - should be answered with the example's intent
+    negated    "I am not ..." / "... नहीं हूँ" forms of the mood_great examples - must
+               not be answered as mood_great
+    others     every example of the intents Rasa has to handle - must not be answered
+
+A lower gate answers more variants; a misroute sends a wrong reply without Rasa.
+
+    python -m benchmarks.bench_fast_path --gates 0.8 0.85 0.9 0.95 1.0
+"""
+import argparse
+import random
+from typing import List, Tuple
+
+from benchmarks._common import load_nlu_examples, time_per_call
+
+from backend.fast_path import FastPathRouter
+
+
+def typo(text: str, rng: random.Random) -> str:
+    letters = [i for i, char in enumerate(text) if char.isalpha()]
+    if len(letters) < 4:
+        return text
+    i = rng.choice(letters)
+    return text[:i] + text[i + 1:] if rng.random() < 0.5 else text[:i] + text[i] + text[i:]
+
+
+def variants(text: str, rng: random.Random) -> List[str]:
+    return [text.upper() + "!!", text.capitalize() + " 🙂", text + text[-1] * 3, f"{text}...", typo(text, rng)]
+
+
+def negate(text: str) -> str:
+    if text.startswith("I am "):
+        return "I am not " + text[5:]
+    if text.endswith("हूँ") and "नहीं" not in text:
+        return text[:-3] + "नहीं हूँ"
+    return "not " + text
+
+
+def score(router: FastPathRouter, samples: List[Tuple[str, str]]) -> Tuple[float, float]:
+    """(share answered with the expected intent, share answered with another one)"""
+    right = wrong = 0
+    for text, expected in samples:
+        routed = router.route(text, "en")
+        if routed is not None:
+            right += routed.intent == expected
+            wrong += routed.intent != expected
+    return right / max(1, len(samples)), wrong / max(1, len(samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gates", type=float, nargs="+", default=[0.8, 0.85, 0.9, 0.95, 1.0])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    examples = load_nlu_examples()
+    router = FastPathRouter(enabled=True)
+    router.load()
+    routed_intents = set(router.responses)
+    variant_samples = [(variant, intent) for intent in sorted(routed_intents) for text in examples[intent]
+                       for variant in variants(text, rng)]
+    negated_samples = [(negate(text), "-") for text in examples.get("mood_great", [])]
+    other_samples = [(text, "-") for intent, texts in examples.items() if intent not in routed_intents
+                     for text in texts]
+    texts = [text for text, _ in variant_samples + other_samples]
+
+    print(f"{len(router.phrases)} table phrases for {', '.join(sorted(routed_intents))}; "
+          f"{len(variant_samples)} variants, {len(negated_samples)} negated, {len(other_samples)} other examples")
+    print(f"{'gate':>6}{'variants ok':>13}{'variants bad':>14}{'negated bad':>13}{'others bad':>12}{'us/msg':>9}")
+    for gate in args.gates:
+        router.min_confidence = gate
+        variants_ok, variants_bad = score(router, variant_samples)
+        negated_bad = sum(1 for text, _ in negated_samples
+                          if (router.route(text, "en") or (None,))[0] == "mood_great") / max(1, len(negated_samples))
+        _, others_bad = score(router, other_samples)
+        timing = time_per_call(lambda: [router.match(text) for text in texts], repeat=3)
+        print(f"{gate:>6.2f}{variants_ok:>13.3f}{variants_bad:>14.3f}{negated_bad:>13.3f}{others_bad:>12.4f}"
+              f"{timing['best_us'] / len(texts):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
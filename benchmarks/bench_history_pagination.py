@@ -0,0 +1,114 @@
+"""
+Per-page cost of GET /history's keyset pagination (backend/history.py).
+
+Creates a throwaway database at the latest migration with one heavy user
+(--messages rows) and one new user (a handful of rows), then times
+fetch_history_page for the first page, a page in the middle and the last page
+of the heavy user's history, the new user's only page, and the same deep pages
+fetched with LIMIT/OFFSET for comparison.
+
+    python -m benchmarks.bench_history_pagination --messages 100000
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import benchmarks._common  # noqa: F401  (puts the repo root on sys.path)
+from backend.history import fetch_history_page
+from backend.migrate import upgrade_database
+from backend.models import ChatHistory
+
+
+def fill(engine, messages: int) -> None:
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, name, email, password) VALUES "
+                          "(1, 'heavy', 'heavy@example.com', 'x'), (2, 'new', 'new@example.com', 'x')"))
+        # Through the table so timestamps are stored in the same format as the ORM writes them
+        insert = ChatHistory.__table__.insert().values(query="q", response="r", intent="wellness_tips")
+        # Pairs of heavy-user rows share a timestamp, so the id tie-break is exercised;
+        # the new user's rows are spread through the same time range
+        rows = [{"user_id": 1, "timestamp": start + timedelta(seconds=i // 2)} for i in range(messages)]
+        rows += [{"user_id": 2, "timestamp": start + timedelta(seconds=i * messages // 20)} for i in range(10)]
+        rows.sort(key=lambda row: row["timestamp"])
+        conn.execute(insert, rows)
+
+
+def timed_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{Path(tmp) / 'history.db'}"
+        upgrade_database(url)
+        engine = create_engine(url)
+        fill(engine, args.messages)
+        db = sessionmaker(bind=engine)()
+
+        # Walk the heavy user's history once to collect every page's cursor
+        cursors = [None]
+        seen = set()
+        t0 = time.perf_counter()
+        while True:
+            rows, next_cursor = fetch_history_page(db, 1, args.page_size, cursors[-1])
+            seen.update(row.id for row in rows)
+            if not next_cursor:
+                break
+            cursors.append(next_cursor)
+        walk_s = time.perf_counter() - t0
+
+        def offset_page(page: int):
+            return db.query(ChatHistory).filter(ChatHistory.user_id == 1) \
+                .order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()) \
+                .offset(page * args.page_size).limit(args.page_size).all()
+
+        middle, last = len(cursors) // 2, len(cursors) - 1
+        report = {
+            "heavy_user_messages": db.query(ChatHistory).filter(ChatHistory.user_id == 1).count(),
+            "pages": len(cursors),
+            "distinct_rows_walked": len(seen),
+            "full_walk_s": round(walk_s, 2),
+            "keyset_ms": {
+                "new_user_first_page": timed_ms(lambda: fetch_history_page(db, 2, args.page_size), args.repeat),
+                "heavy_first_page": timed_ms(lambda: fetch_history_page(db, 1, args.page_size), args.repeat),
+                "heavy_middle_page": timed_ms(
+                    lambda: fetch_history_page(db, 1, args.page_size, cursors[middle]), args.repeat),
+                "heavy_last_page": timed_ms(
+                    lambda: fetch_history_page(db, 1, args.page_size, cursors[last]), args.repeat),
+            },
+            "offset_ms": {
+                "heavy_first_page": timed_ms(lambda: offset_page(0), args.repeat),
+                "heavy_middle_page": timed_ms(lambda: offset_page(middle), args.repeat),
+                "heavy_last_page": timed_ms(lambda: offset_page(last), args.repeat),
+            },
+            "plan": [row[-1] for row in db.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM chat_history WHERE user_id = 1 AND "
+                "timestamp <= :ts AND (timestamp < :ts OR id < :id) "
+                "ORDER BY timestamp DESC, id DESC LIMIT 21"), {"ts": "2025-01-01 12:00:00", "id": 1000})],
+        }
+        db.close()
+        engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare the old per-keyword substring loop with the Aho-Corasick matcher
+(and the full BM25-ranked lookup) on the shipped KB files, using the
+nlu.yml examples of each KB intent.
+
+Next to the speed numbers, the messages without a keyword hit (the ones left to BM25)
+show how KB_MIN_SCORE / KB_MIN_TERMS gate them:
+
+    answered   share of the intent's own examples that still get an answer
+    false pos  share of the other intents' examples that get one; intents whose KB
+               covers the same topics (at least half the entry ids shared, e.g.
+               ask_about_symptom / ask_about_prevention) are not counted as negatives
+
+The sweep table below it repeats both rates, over all intents, for other thresholds.
+
+    python -m benchmarks.bench_kb_match
+    python -m benchmarks.bench_kb_match --min-scores 4 5 6 7 8 --min-terms 1 2
+"""
+import argparse
+from typing import Dict, List, Tuple
+
+from benchmarks._common import load_nlu_examples, time_per_call
+
+from actions.kb_search import KB_MIN_SCORE, KB_MIN_TERMS
+from actions.kb_store import KBIntent, KBStore
+
+SIBLING_OVERLAP = 0.5
+
+
+def legacy_first_entry(entries, user_msg):
+    for idx, entry in enumerate(entries):
+        keywords = [k.lower() for k in entry.get("keywords", [])]
+        for kw in keywords:
+            if kw in user_msg:
+                return idx
+    return None
+
+
+def siblings(store: KBStore, intent: str) -> List[str]:
+    """Intents whose KB shares at least SIBLING_OVERLAP of its entry ids with this one's."""
+    ids = set(store.get(intent).entry_ids)
+    shared = []
+    for other in store.intents():
+        other_ids = set(store.get(other).entry_ids)
+        if other != intent and len(ids & other_ids) >= SIBLING_OVERLAP * min(len(ids), len(other_ids)):
+            shared.append(other)
+    return shared
+
+
+def best_scores(kb: KBIntent, messages: List[str], min_terms: int) -> List[float]:
+    """Best BM25 score of each message without a keyword hit (0.0 when nothing matches)."""
+    scores = []
+    for msg in messages:
+        ranked = kb.index.search(msg, k=1, min_terms=min_terms)
+        scores.append(ranked[0][1] if ranked else 0.0)
+    return scores
+
+
+def share(scores: List[float], min_score: float) -> float:
+    return sum(score >= min_score for score in scores) / max(1, len(scores))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-scores", type=float, nargs="+", default=[3, 4, 5, 6, 7, 8, 9, 10])
+    parser.add_argument("--min-terms", type=int, nargs="+", default=sorted({1, KB_MIN_TERMS}))
+    args = parser.parse_args()
+
+    store = KBStore()
+    store.load_all()
+    examples = load_nlu_examples()
+    # (own, other) no-keyword messages per intent, for the sweep
+    unmatched: Dict[str, Tuple[List[str], List[str]]] = {}
+
+    print(f"KB_MIN_SCORE={KB_MIN_SCORE} KB_MIN_TERMS={KB_MIN_TERMS}")
+    print(f"{'intent':<22}{'entries':>8}{'msgs':>7}{'loop us/msg':>14}{'automaton us/msg':>18}{'speedup':>9}"
+          f"{'bm25 us/msg':>13}{'no kw':>7}{'answered':>10}{'false pos':>11}")
+    for intent in store.intents():
+        kb = store.get(intent)
+        messages = [m.lower() for m in examples.get(intent, [])]
+        if not messages:
+            continue
+
+        for msg in messages:
+            expected = legacy_first_entry(kb.entries, msg)
+            actual = kb.matcher.first_entry(msg)
+            assert expected == actual, f"{intent}: mismatch for {msg!r}: {expected} != {actual}"
+
+        loop = time_per_call(lambda: [legacy_first_entry(kb.entries, m) for m in messages], number=3)
+        fast = time_per_call(lambda: [kb.matcher.first_entry(m) for m in messages], number=3)
+        ranked = time_per_call(lambda: [kb.rank_entries(m) for m in messages], number=3)
+        loop_us = loop["best_us"] / len(messages)
+        fast_us = fast["best_us"] / len(messages)
+        ranked_us = ranked["best_us"] / len(messages)
+
+        excluded = set(siblings(store, intent)) | {intent}
+        own = [m for m in messages if not kb.matcher.matched_entries(m)]
+        other = [m.lower() for name, texts in examples.items() if name not in excluded for m in texts]
+        other = [m for m in other if not kb.matcher.matched_entries(m)]
+        unmatched[intent] = own, other
+        answered = sum(bool(kb.rank_entries(m)) for m in own) / max(1, len(own))
+        false_pos = sum(bool(kb.rank_entries(m)) for m in other) / max(1, len(other))
+        print(f"{intent:<22}{len(kb.entries):>8}{len(messages):>7}{loop_us:>14.1f}{fast_us:>18.1f}"
+              f"{loop_us / fast_us:>8.1f}x{ranked_us:>13.1f}{len(own):>7}{answered:>10.3f}{false_pos:>11.3f}")
+
+    print(f"\n{'min terms':>10}{'min score':>11}{'answered':>10}{'false pos':>11}")
+    for min_terms in args.min_terms:
+        own_scores: List[float] = []
+        other_scores: List[float] = []
+        for intent, (own, other) in unmatched.items():
+            kb = store.get(intent)
+            own_scores += best_scores(kb, own, min_terms)
+            other_scores += best_scores(kb, other, min_terms)
+        for min_score in args.min_scores:
+            print(f"{min_terms:>10}{min_score:>11.1f}{share(own_scores, min_score):>10.3f}"
+                  f"{share(other_scores, min_score):>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
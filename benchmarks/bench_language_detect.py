@@ -0,0 +1,120 @@
+"""
+Accuracy and speed of the script-based language detector. Accuracy is measured on a
+small hand-labelled set (the language the reply should be in), split into English,
+Devanagari Hindi, romanized Hindi and code-switched messages; speed on every nlu.yml
+example. langdetect is measured too when it is installed.
+
+    python -m benchmarks.bench_language_detect
+"""
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks._common import load_nlu_examples, time_per_call
+
+from actions.language import detect_language
+
+LABELLED: Dict[str, List[Tuple[str, str]]] = {
+    "english": [(text, "en") for text in (
+        "I have a headache since morning",
+        "What are the symptoms of dengue?",
+        "How can I sleep better at night?",
+        "my dog ate chocolate, what should I do",
+        "Tips for staying hydrated in summer",
+        "I feel anxious before exams",
+        "is it safe to take paracetamol with milk",
+        "my pet cat scratched me",
+        "I cut my finger while cooking",
+        "how to treat a minor burn",
+        "can stress cause chest pain",
+        "what is a healthy breakfast",
+        "I am feeling low today",
+        "my kid has a fever of 102",
+        "how much water should I drink daily",
+        "back pain after sitting all day",
+        "ok thanks bye",
+        "hi",
+        "good morning",
+        "what causes high blood pressure",
+    )],
+    "hindi": [(text, "hi") for text in (
+        "मुझे सुबह से सिरदर्द है",
+        "डेंगू के लक्षण क्या हैं?",
+        "रात को अच्छी नींद कैसे आए?",
+        "मेरे कुत्ते ने चॉकलेट खा ली, क्या करूँ",
+        "गर्मी में पानी की कमी से कैसे बचें",
+        "परीक्षा से पहले घबराहट होती है",
+        "क्या दूध के साथ पैरासिटामोल ले सकते हैं",
+        "खाना बनाते समय उंगली कट गई",
+        "हल्के जलने का इलाज कैसे करें",
+        "क्या तनाव से सीने में दर्द हो सकता है",
+        "नमस्ते",
+        "धन्यवाद",
+        "मेरे बच्चे को बुखार है",
+        "रोज़ कितना पानी पीना चाहिए",
+        "पूरे दिन बैठने से कमर दर्द",
+    )],
+    "romanized": [(text, "hi") for text in (
+        "mujhe bukhar hai kya karu",
+        "sar me bahut dard ho raha hai",
+        "neend nahi aati kya karna chahiye",
+        "pet dard ka ilaj batao",
+        "main bahut pareshan hoon",
+        "khansi aur zukam ke liye kya lu",
+        "mera gala kharab hai",
+        "kamar me dard hai kya karu",
+        "mujhe chinta ho rahi hai",
+        "bacche ko ulti ho rahi hai",
+        "haath jal gaya kya lagau",
+        "din bhar thakan rehti hai",
+        "dil ki dhadkan tez hai",
+        "aaj mood accha nahi hai",
+        "namaste kaise ho",
+    )],
+    "mixed": [
+        ("मुझे migraine है", "hi"),
+        ("BP high है क्या करूँ", "hi"),
+        ("मेरा sugar level बढ़ गया है", "hi"),
+        ("covid के symptoms क्या हैं", "hi"),
+        ("mujhe headache hai", "hi"),
+        ("anxiety ke liye tips batao", "hi"),
+        ("diet plan for diabetes batao", "hi"),
+        ("what does थकान mean", "en"),
+        ("how do I say fever in Hindi, is it बुखार", "en"),
+        ("please tell me about yoga", "en"),
+    ],
+}
+
+
+def evaluate(detector: Callable[[str], str], samples: List[Tuple[str, str]]) -> float:
+    correct = sum(1 for text, expected in samples if detector(text) == expected)
+    return correct / len(samples) if samples else 0.0
+
+
+def main():
+    examples = load_nlu_examples()
+    texts = [text for texts in examples.values() for text in texts]
+
+    detectors = {"script": detect_language}
+    try:
+        from langdetect import DetectorFactory, detect
+        DetectorFactory.seed = 0
+
+        def langdetect_detect(text):
+            try:
+                return "hi" if detect(text).startswith("hi") else "en"
+            except Exception:
+                return "en"
+        detectors["langdetect"] = langdetect_detect
+    except ImportError:
+        print("langdetect not installed, skipping comparison")
+
+    print(", ".join(f"{len(samples)} {group}" for group, samples in LABELLED.items())
+          + f" labelled messages; timing over {len(texts)} nlu.yml examples")
+    print(f"{'detector':<12}" + "".join(f"{group + ' acc':>15}" for group in LABELLED) + f"{'us/msg':>9}")
+    for name, detector in detectors.items():
+        timing = time_per_call(lambda: [detector(t) for t in texts], repeat=3)
+        print(f"{name:<12}" + "".join(f"{evaluate(detector, samples):>15.3f}" for samples in LABELLED.values())
+              + f"{timing['best_us'] / len(texts):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
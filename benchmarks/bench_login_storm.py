@@ -0,0 +1,121 @@
+"""
+Chat latency during a login storm (backend/passwords.py).
+
+Starts benchmarks.rasa_stub and `uvicorn backend.main:app` as separate processes (see
+benchmarks.loadtest), registers a pool of users, then keeps /predict_chat at a steady
+open-loop rate through three phases:
+
+    calm     chat only
+    storm    chat plus --login-rps logins per second (bcrypt at BCRYPT_ROUNDS)
+    after    chat only again, while any queued logins drain
+
+Each phase prints a JSON line with chat and login p50/p99, errors, and the password-hash
+queue wait, rejections (503) and bcrypt time read from /metrics. Chat p99 in `storm`
+should stay close to `calm`: logins wait on their own PASSWORD_HASH_WORKERS threads, and
+beyond PASSWORD_HASH_MAX_QUEUE they are refused instead of queueing.
+
+    python -m benchmarks.bench_login_storm --chat-rps 20 --login-rps 30 --phase-s 15
+    python -m benchmarks.bench_login_storm --config w1:PASSWORD_HASH_WORKERS=1 --config w4:PASSWORD_HASH_WORKERS=4
+"""
+import argparse
+import asyncio
+import json
+import re
+import shlex
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+import aiohttp
+
+from benchmarks._common import load_nlu_examples
+from benchmarks.loadtest.servers import free_port, parse_config, start_backend, start_stub, stop
+from benchmarks.loadtest.workload import Workload, run_open_loop
+
+DEFAULT_STUB_ARGS = "--nlu-ms 20 --action-ms 5"
+
+_METRIC_RE = re.compile(r'^(wellbot_password_hash_\w+?)(?:\{([^}]*)\})? (\S+)$', re.M)
+
+
+async def hash_metrics(session: aiohttp.ClientSession, base_url: str) -> Dict[str, float]:
+    """Every wellbot_password_hash_* sample, keyed by name plus labels."""
+    async with session.get(f"{base_url}/metrics") as resp:
+        text = await resp.text()
+    return {f"{name}{{{labels}}}" if labels else name: float(value) for name, labels, value in _METRIC_RE.findall(text)}
+
+
+def mean_ms(before: Dict[str, float], after: Dict[str, float], metric: str, labels: str = "") -> float:
+    suffix = f"{{{labels}}}" if labels else ""
+    count = after.get(f"{metric}_count{suffix}", 0.0) - before.get(f"{metric}_count{suffix}", 0.0)
+    total = after.get(f"{metric}_sum{suffix}", 0.0) - before.get(f"{metric}_sum{suffix}", 0.0)
+    return round(total / count * 1000, 1) if count else 0.0
+
+
+async def run_phase(workload: Workload, session: aiohttp.ClientSession, args, logins: bool) -> Dict[str, dict]:
+    runs = [run_open_loop(workload, session, {"predict_chat": 1}, args.chat_rps, args.phase_s,
+                          args.max_in_flight)]
+    if logins:
+        runs.append(run_open_loop(workload, session, {"login": 1}, args.login_rps, args.phase_s,
+                                  args.max_in_flight, seed=2))
+    endpoints = {}
+    for report in await asyncio.gather(*runs):
+        endpoints.update(report)
+    return endpoints
+
+
+async def run_config(name: str, env: Dict[str, str], args, samples, tmp: Path) -> None:
+    stub_port, backend_port = free_port(), free_port()
+    stub = backend = None
+    try:
+        stub = start_stub(stub_port, shlex.split(args.stub_args))
+        backend = start_backend(backend_port, stub_port, tmp / f"{name}.db", env, log_path=tmp / f"{name}.log")
+        base_url = f"http://127.0.0.1:{backend_port}"
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.max_in_flight),
+                                         timeout=timeout) as session:
+            workload = Workload(base_url, samples, run_id=f"{name}-{int(time.time())}")
+            await workload.setup(session, args.users)
+            for phase in ("calm", "storm", "after"):
+                before = await hash_metrics(session, base_url)
+                endpoints = await run_phase(workload, session, args, logins=phase == "storm")
+                after = await hash_metrics(session, base_url)
+                print(json.dumps({
+                    "config": name, "env": env, "phase": phase, "endpoints": endpoints,
+                    "hash_queue_wait_mean_ms": mean_ms(before, after, "wellbot_password_hash_queue_wait_seconds"),
+                    "bcrypt_verify_mean_ms": mean_ms(before, after, "wellbot_password_hash_duration_seconds",
+                                                     'op="verify"'),
+                    "hash_rejected": {reason: int(after.get(f'wellbot_password_hash_rejected_total{{reason="{reason}"}}', 0)
+                                                  - before.get(f'wellbot_password_hash_rejected_total{{reason="{reason}"}}', 0))
+                                      for reason in ("queue_full", "queue_timeout")},
+                }), flush=True)
+    finally:
+        stop(backend)
+        stop(stub)
+
+
+async def main_async(args) -> None:
+    examples = load_nlu_examples()
+    samples = [text for texts in examples.values() for text in texts]
+    with tempfile.TemporaryDirectory() as tmp:
+        for spec in args.config or ["default:"]:
+            name, env = parse_config(spec)
+            await run_config(name, env, args, samples, Path(tmp))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", help="NAME:ENV=VALUE,... (repeatable)")
+    parser.add_argument("--chat-rps", type=float, default=20.0)
+    parser.add_argument("--login-rps", type=float, default=30.0)
+    parser.add_argument("--phase-s", type=float, default=15.0, help="duration of each phase")
+    parser.add_argument("--users", type=int, default=20, help="users registered before the first phase")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--stub-args", default=DEFAULT_STUB_ARGS, help="passed to benchmarks.rasa_stub")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Fault-injection scenario for the Rasa resilience layer (backend/resilience.py).
+
+Starts benchmarks.rasa_stub and the backend in-process (as bench_chat_pipeline does) and
+drives POST /predict_chat through a sequence of phases, changing the stub's faults
+between them:
+
+    healthy     no faults
+    outage      every webhook and parse call hangs for 10x RASA_TIMEOUT
+    recovery    no faults again (the breaker must close)
+    parse_tail  5% of /model/parse calls take an extra --tail-ms (what hedging is for)
+    errors      half of all calls answer HTTP 500
+
+Each phase runs once with the resilience layer off (no breaker, no concurrency limit,
+no hedging) and once with it on, reporting latency percentiles, the share of replies
+that were the localized fallback, and how many calls the breaker/limit rejected.
+
+    python -m benchmarks.bench_rasa_faults --phase-s 8 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+import uvicorn
+
+from benchmarks._common import ROOT, load_nlu_examples, percentile
+from benchmarks.bench_chat_pipeline import free_port, use_temp_db, wait_for_port
+
+from backend.chat import BACKEND_ERROR, UNREACHABLE
+from backend.main import app
+from backend.metrics import RASA_HEDGES, RASA_REJECTED
+from backend.rasa_client import rasa_client
+from backend.resilience import CircuitBreaker, ConcurrencyLimiter
+
+FALLBACKS = set(UNREACHABLE.values()) | set(BACKEND_ERROR.values())
+
+
+def phases(rasa_timeout: float, tail_ms: float):
+    hang = {"slow_rate": 1.0, "slow_ms": rasa_timeout * 10000}
+    return [
+        ("healthy", {"error_rate": 0}),
+        ("outage", hang),
+        ("recovery", {"error_rate": 0}),
+        ("parse_tail", {"webhook": {}, "parse": {"slow_rate": 0.05, "slow_ms": tail_ms}}),
+        ("errors", {"error_rate": 0.5}),
+    ]
+
+
+def configure(resilient: bool, args) -> None:
+    if resilient:
+        rasa_client.breaker = CircuitBreaker(args.breaker_failures, args.breaker_reset_s)
+        rasa_client.limiter = ConcurrencyLimiter(args.max_concurrency, args.queue_timeout)
+        rasa_client.parse_hedge_delay = args.hedge_ms / 1000.0
+    else:
+        rasa_client.breaker = CircuitBreaker(failure_threshold=0)
+        rasa_client.limiter = ConcurrencyLimiter(limit=0)
+        rasa_client.parse_hedge_delay = 0.0
+
+
+async def run_phase(url: str, samples, users: int, concurrency: int, duration: float):
+    latencies = []
+    fallbacks = 0
+    errors = 0
+    deadline = time.monotonic() + duration
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def client(idx: int):
+            nonlocal fallbacks, errors
+            rng = random.Random(idx)
+            while time.monotonic() < deadline:
+                _, text = rng.choice(samples)
+                body = {"user_id": idx % users + 1, "message": text}
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json=body) as resp:
+                        data = await resp.json(content_type=None)
+                        if resp.status != 200:
+                            errors += 1
+                        elif data["response"] in FALLBACKS:
+                            fallbacks += 1
+                except aiohttp.ClientError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / duration, 1),
+        "fallback_rate": round(fallbacks / max(1, len(latencies)), 3),
+        "http_errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies, default=0.0), 1),
+    }
+
+
+async def main_async(args):
+    examples = load_nlu_examples()
+    samples = [(intent, text) for intent, texts in examples.items() for text in texts]
+
+    stub_port, backend_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.rasa_stub", "--port", str(stub_port),
+         "--nlu-ms", str(args.nlu_ms), "--action-ms", str(args.action_ms)],
+        cwd=ROOT,
+    )
+    rasa_client.url = f"{stub_url}/webhooks/rest/webhook"
+    rasa_client.parse_url = f"{stub_url}/model/parse"
+    rasa_client.pipeline_mode = args.mode
+    rasa_client.timeout = aiohttp.ClientTimeout(total=args.rasa_timeout, connect=args.rasa_timeout)
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=backend_port,
+                                           log_level="warning", access_log=False))
+    server_task = asyncio.create_task(server.serve())
+    try:
+        await wait_for_port(stub_port)
+        await wait_for_port(backend_port)
+        url = f"http://127.0.0.1:{backend_port}/predict_chat"
+        async with aiohttp.ClientSession() as control:
+            for resilient in (False, True):
+                configure(resilient, args)
+                for name, faults in phases(args.rasa_timeout, args.tail_ms):
+                    async with control.post(f"{stub_url}/faults", json=faults) as resp:
+                        await resp.read()
+                    rejected = {reason: RASA_REJECTED.value(reason=reason)
+                                for reason in ("circuit_open", "queue_timeout")}
+                    hedges = {outcome: RASA_HEDGES.value(outcome=outcome) for outcome in ("sent", "won")}
+                    result = await run_phase(url, samples, args.users, args.concurrency, args.phase_s)
+                    result.update({
+                        "resilience": "on" if resilient else "off",
+                        "phase": name,
+                        "breaker_state": rasa_client.breaker.state,
+                        "rejected": {reason: int(RASA_REJECTED.value(reason=reason) - before)
+                                     for reason, before in rejected.items()},
+                        "hedges": {outcome: int(RASA_HEDGES.value(outcome=outcome) - before)
+                                   for outcome, before in hedges.items()},
+                    })
+                    print(json.dumps(result), flush=True)
+                    # Let calls still hanging from this phase time out before the next one
+                    await asyncio.sleep(args.rasa_timeout)
+    finally:
+        server.should_exit = True
+        await server_task
+        stub.terminate()
+        stub.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phase-s", type=float, default=8.0, help="duration of each phase")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--mode", choices=("serial", "concurrent", "metadata"), default="serial")
+    parser.add_argument("--nlu-ms", type=float, default=20.0)
+    parser.add_argument("--action-ms", type=float, default=5.0)
+    parser.add_argument("--tail-ms", type=float, default=800.0, help="extra parse latency in parse_tail")
+    parser.add_argument("--rasa-timeout", type=float, default=2.0, help="RASA_TIMEOUT for the run")
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    parser.add_argument("--breaker-reset-s", type=float, default=2.0)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--queue-timeout", type=float, default=1.0)
+    parser.add_argument("--hedge-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_temp_db(Path(tmp) / "bench.db", args.users)
+        asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
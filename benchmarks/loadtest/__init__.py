@@ -0,0 +1,7 @@
+"""
+Load-testing harness for the backend: starts benchmarks.rasa_stub and the backend under
+uvicorn as separate processes, then drives /register, /login, /predict_chat and
+/feedback at fixed target rates. See __main__.py for the command line.
+
+    python -m benchmarks.loadtest --rps 25 50 100 200
+"""
@@ -0,0 +1,129 @@
+"""
+Capacity test of the backend on one box.
+
+For every backend configuration, starts benchmarks.rasa_stub and `uvicorn backend.main:app`
+(fresh SQLite file, migrated up front) as separate processes, registers and logs in a
+pool of users, then runs each target rate for --duration seconds with an open-loop,
+Poisson-arrival mix of /register, /login, /predict_chat and /feedback. Each step prints a
+JSON line with per-endpoint throughput, p50/p90/p99 (measured from the scheduled start),
+errors, and the mean time of each chat stage read from /metrics. The summary gives the
+highest rate each configuration sustained: under 1% errors and p99 within --slo-ms
+for every endpoint.
+
+Configurations are NAME:ENV=VALUE,ENV=VALUE (repeatable); the default compares the
+stock settings with the pipeline/write options added for throughput:
+
+    python -m benchmarks.loadtest --rps 25 50 100 200 --duration 20
+    python -m benchmarks.loadtest --config base: --config wal4:CHAT_WRITE_MODE=group_commit --workers 4
+    python -m benchmarks.loadtest --mix predict_chat=100 --stub-args="--nlu-ms 80 --latency-dist lognormal"
+"""
+import argparse
+import asyncio
+import json
+import shlex
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import aiohttp
+
+from benchmarks._common import load_nlu_examples
+from benchmarks.loadtest.servers import free_port, parse_config, start_backend, start_stub, stop
+from benchmarks.loadtest.workload import (
+    DEFAULT_MIX, Workload, parse_mix, run_open_loop, stage_means_ms, stage_totals
+)
+
+DEFAULT_CONFIGS = [
+    "default:",
+    "tuned:RASA_PIPELINE_MODE=metadata,CHAT_WRITE_MODE=group_commit",
+]
+DEFAULT_STUB_ARGS = "--nlu-ms 40 --action-ms 10 --nlu-concurrency 8 --latency-dist lognormal"
+
+
+def sustained(step: dict, slo_ms: float) -> bool:
+    # Arrivals are open-loop, so the offered rate is always the target; a backend that
+    # falls behind shows it as queueing (p99) and timeouts (errors), which is what is checked
+    endpoints = step["endpoints"].values()
+    total = sum(e["requests"] + e["dropped"] for e in endpoints)
+    errors = sum(e["errors"] + e["dropped"] for e in endpoints)
+    return errors <= 0.01 * max(1, total) and all(e["p99_ms"] <= slo_ms for e in endpoints if e["requests"])
+
+
+async def run_config(name: str, env: Dict[str, str], args, samples: List[str], tmp: Path) -> List[dict]:
+    stub_port, backend_port = free_port(), free_port()
+    stub = backend = None
+    steps = []
+    try:
+        stub = start_stub(stub_port, shlex.split(args.stub_args))
+        backend = start_backend(backend_port, stub_port, tmp / f"{name}.db", env, args.workers,
+                                log_path=tmp / f"{name}.log")
+        base_url = f"http://127.0.0.1:{backend_port}"
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        connector = aiohttp.TCPConnector(limit=args.max_in_flight)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            workload = Workload(base_url, samples, run_id=f"{name}-{int(time.time())}")
+            t0 = time.perf_counter()
+            await workload.setup(session, args.users)
+            print(f"[loadtest] {name}: {len(workload.users)} users ready in {time.perf_counter() - t0:.1f}s",
+                  flush=True)
+
+            for rps in args.rps:
+                before = await stage_totals(session, base_url)
+                endpoints = await run_open_loop(workload, session, args.mix, rps, args.duration,
+                                                args.max_in_flight, poisson=not args.constant_rate)
+                step = {
+                    "config": name, "env": env, "workers": args.workers, "target_rps": rps,
+                    "endpoints": endpoints,
+                    "stage_mean_ms": stage_means_ms(before, await stage_totals(session, base_url)),
+                }
+                step["sustained"] = sustained(step, args.slo_ms)
+                steps.append(step)
+                print(json.dumps(step), flush=True)
+                await asyncio.sleep(args.cooldown)
+    finally:
+        stop(backend)
+        stop(stub)
+    return steps
+
+
+async def main_async(args) -> None:
+    examples = load_nlu_examples()
+    samples = [text for texts in examples.values() for text in texts]
+    summary = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for spec in args.config or DEFAULT_CONFIGS:
+            name, env = parse_config(spec)
+            steps = await run_config(name, env, args, samples, Path(tmp))
+            passed = [step["target_rps"] for step in steps if step["sustained"]]
+            failed = [step["target_rps"] for step in steps if not step["sustained"]]
+            summary[name] = {
+                "max_sustained_rps": max(passed, default=0),
+                "first_saturated_rps": min(failed, default=None),
+                "predict_chat_p99_ms": {step["target_rps"]: step["endpoints"].get("predict_chat", {}).get("p99_ms")
+                                        for step in steps},
+            }
+    print(json.dumps({"summary": summary}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", help="NAME:ENV=VALUE,... (repeatable)")
+    parser.add_argument("--rps", type=float, nargs="+", default=[25, 50, 100, 200])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per rate step")
+    parser.add_argument("--cooldown", type=float, default=2.0)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="endpoint weights, e.g. predict_chat=80,feedback=10,login=8,register=2")
+    parser.add_argument("--users", type=int, default=50, help="users registered before the first step")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--request-timeout", type=float, default=30.0)
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="p99 bound for a step to count as sustained")
+    parser.add_argument("--constant-rate", action="store_true", help="evenly spaced instead of Poisson arrivals")
+    parser.add_argument("--stub-args", default=DEFAULT_STUB_ARGS, help="passed to benchmarks.rasa_stub")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
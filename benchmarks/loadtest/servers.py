@@ -0,0 +1,86 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from benchmarks._common import ROOT
+
+
+def parse_config(spec: str) -> Tuple[str, Dict[str, str]]:
+    """'NAME:ENV=VALUE,ENV=VALUE' -> (name, environment overrides for start_backend)"""
+    name, _, assignments = spec.partition(":")
+    env = {}
+    for assignment in filter(None, assignments.split(",")):
+        key, _, value = assignment.partition("=")
+        env[key.strip()] = value.strip()
+    return name or "default", env
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_http(url: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"process for {url} exited with code {proc.returncode}")
+        try:
+            with urlopen(url, timeout=1):
+                return
+        except (URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def stop(proc: Optional[subprocess.Popen]) -> None:
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def start_stub(port: int, stub_args: List[str]) -> subprocess.Popen:
+    """benchmarks.rasa_stub on port; stub_args are passed through (latency, faults)."""
+    proc = subprocess.Popen([sys.executable, "-m", "benchmarks.rasa_stub", "--port", str(port)] + stub_args,
+                            cwd=ROOT)
+    wait_http(f"http://127.0.0.1:{port}/stats", proc)
+    return proc
+
+
+def start_backend(port: int, stub_port: int, db_path: Path, env_overrides: Dict[str, str],
+                  workers: int = 1, log_path: Optional[Path] = None) -> subprocess.Popen:
+    """
+    Migrate a fresh SQLite file, then start `uvicorn backend.main:app` with the config's
+    environment. Migrations run once up front so several workers do not race on them.
+    """
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "RASA_URL": f"http://127.0.0.1:{stub_port}/webhooks/rest/webhook",
+        "RASA_PARSE_URL": f"http://127.0.0.1:{stub_port}/model/parse",
+        "MIGRATE_ON_STARTUP": "false",
+    })
+    env.update(env_overrides)
+    subprocess.run([sys.executable, "-m", "backend.migrate"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    log = open(log_path, "w") if log_path else subprocess.DEVNULL
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    wait_http(f"http://127.0.0.1:{port}/ping", proc)
+    return proc
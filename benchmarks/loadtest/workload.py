@@ -0,0 +1,182 @@
+import asyncio
+import itertools
+import random
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from benchmarks._common import percentile
+
+ENDPOINTS = ("register", "login", "predict_chat", "feedback")
+DEFAULT_MIX = {"predict_chat": 80, "feedback": 10, "login": 8, "register": 2}
+PASSWORD = "load-test-pw"
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'predict_chat=80,feedback=10' -> {"predict_chat": 80.0, "feedback": 10.0}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r}; expected one of {ENDPOINTS}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+class User:
+    def __init__(self, email: str):
+        self.email = email
+        self.user_id: Optional[int] = None
+        self.token: Optional[str] = None
+
+
+class Workload:
+    """
+    Issues the four user-facing calls against one backend. A pool of users is registered
+    and logged in up front, so /predict_chat and /feedback have real ids and tokens;
+    steady-state /register calls use fresh addresses.
+    """
+
+    def __init__(self, base_url: str, samples: List[str], run_id: str, seed: int = 42):
+        self.base_url = base_url
+        self.samples = samples
+        self.run_id = run_id
+        self.users: List[User] = []
+        self._rng = random.Random(seed)
+        self._new_users = itertools.count()
+
+    def _email(self) -> str:
+        return f"lt-{self.run_id}-{next(self._new_users)}@example.com"
+
+    async def setup(self, session: aiohttp.ClientSession, users: int, parallel: int = 8) -> None:
+        slots = asyncio.Semaphore(parallel)
+
+        async def one():
+            user = User(self._email())
+            async with slots:
+                await self.register(session, user)
+                await self.login(session, user)
+            if user.token:
+                self.users.append(user)
+
+        await asyncio.gather(*(one() for _ in range(users)))
+        if not self.users:
+            raise RuntimeError("could not register any load-test users")
+
+    async def register(self, session: aiohttp.ClientSession, user: Optional[User] = None) -> int:
+        user = user or User(self._email())
+        body = {"name": "load test", "email": user.email, "password": PASSWORD}
+        async with session.post(f"{self.base_url}/register", json=body) as resp:
+            await resp.read()
+            return resp.status
+
+    async def login(self, session: aiohttp.ClientSession, user: Optional[User] = None) -> int:
+        user = user or self._rng.choice(self.users)
+        async with session.post(f"{self.base_url}/login", json={"email": user.email, "password": PASSWORD}) as resp:
+            data = await resp.json(content_type=None)
+            if resp.status == 200:
+                user.token, user.user_id = data["access_token"], data["user_id"]
+            return resp.status
+
+    async def predict_chat(self, session: aiohttp.ClientSession) -> int:
+        user = self._rng.choice(self.users)
+        body = {"user_id": user.user_id, "message": self._rng.choice(self.samples)}
+        async with session.post(f"{self.base_url}/predict_chat", json=body) as resp:
+            await resp.read()
+            return resp.status
+
+    async def feedback(self, session: aiohttp.ClientSession) -> int:
+        user = self._rng.choice(self.users)
+        body = {"user_id": user.user_id, "user_query": self._rng.choice(self.samples),
+                "bot_response": "load test reply",
+                "feedback": "positive" if self._rng.random() < 0.7 else "negative"}
+        async with session.post(f"{self.base_url}/feedback", json=body,
+                                headers={"Authorization": f"Bearer {user.token}"}) as resp:
+            await resp.read()
+            return resp.status
+
+
+async def run_open_loop(workload: Workload, session: aiohttp.ClientSession, mix: Dict[str, float],
+                        rps: float, duration: float, max_in_flight: int, poisson: bool = True,
+                        seed: int = 1) -> Dict[str, dict]:
+    """
+    Open-loop load: requests are started on a schedule at `rps` regardless of how fast
+    earlier ones finish, so a saturated backend shows up as growing latency instead of
+    a silently lower request rate. Latency is measured from the scheduled start (not the
+    actual send), which keeps the generator's own lag in the numbers. Requests that
+    would exceed max_in_flight are counted as dropped.
+    """
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples: Dict[str, List[Tuple[float, bool]]] = {name: [] for name in names}
+    dropped = {name: 0 for name in names}
+    in_flight = set()
+
+    async def fire(name: str, scheduled: float):
+        try:
+            status = await getattr(workload, name)(session)
+            ok = status < 400
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+        samples[name].append((time.perf_counter() - scheduled, ok))
+
+    start = time.perf_counter()
+    next_at = start
+    while next_at - start < duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        name = rng.choices(names, weights)[0]
+        if len(in_flight) >= max_in_flight:
+            dropped[name] += 1
+        else:
+            task = asyncio.ensure_future(fire(name, next_at))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        next_at += rng.expovariate(rps) if poisson else 1.0 / rps
+    if in_flight:
+        await asyncio.wait(in_flight)
+    elapsed = time.perf_counter() - start
+
+    report = {}
+    for name in names:
+        latencies = [latency * 1000 for latency, _ in samples[name]]
+        errors = sum(1 for _, ok in samples[name] if not ok)
+        report[name] = {
+            "requests": len(latencies),
+            "throughput_rps": round((len(latencies) - errors) / elapsed, 1),
+            "errors": errors,
+            "dropped": dropped[name],
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p90_ms": round(percentile(latencies, 90), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+        }
+    return report
+
+
+_SAMPLE_RE = re.compile(r'^wellbot_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$', re.M)
+
+
+async def stage_totals(session: aiohttp.ClientSession, base_url: str) -> Dict[str, Tuple[float, float]]:
+    """{stage: (sum seconds, count)} from the backend's /metrics (one worker's view)."""
+    try:
+        async with session.get(f"{base_url}/metrics") as resp:
+            text = await resp.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return {}
+    totals: Dict[str, List[float]] = {}
+    for kind, stage, value in _SAMPLE_RE.findall(text):
+        totals.setdefault(stage, [0.0, 0.0])[0 if kind == "sum" else 1] = float(value)
+    return {stage: (total, count) for stage, (total, count) in totals.items()}
+
+
+def stage_means_ms(before: Dict[str, Tuple[float, float]], after: Dict[str, Tuple[float, float]]) -> Dict[str, float]:
+    means = {}
+    for stage, (total, count) in after.items():
+        prev_total, prev_count = before.get(stage, (0.0, 0.0))
+        if count > prev_count:
+            means[stage] = round((total - prev_total) / (count - prev_count) * 1000, 2)
+    return means
@@ -0,0 +1,178 @@
+"""
+Stand-in for a Rasa server, for benchmarking the backend without a trained model.
+
+Serves the REST channel webhook (plain and ?stream=true) and /model/parse. Every NLU
+pass (one per webhook call, one per parse call) sleeps --nlu-ms; the webhook
+additionally sleeps --action-ms for the action round trip. --nlu-concurrency caps how many NLU passes run at once, like a
+Rasa server with a fixed number of inference workers (0 = unbounded).
+--latency-dist draws each sleep around those means instead of using them as is:
+uniform (0..2x mean), exponential, or lognormal (--latency-sigma sets the spread;
+a BERT pipeline's latency is closer to this than to a constant).
+Intents are looked up from the nlu.yml examples; unknown text gets nlu_fallback.
+
+Faults can be injected per endpoint (webhook, parse): --error-rate answers that share
+of calls with HTTP 500, --invalid-rate with a 200 HTML page (a proxy's error page),
+--slow-rate delays that share by an extra --slow-ms (set it
+above RASA_TIMEOUT to simulate a hung Rasa). POST /faults changes them at runtime,
+e.g. {"parse": {"slow_rate": 0.05, "slow_ms": 800}}, or {"error_rate": 1} for both.
+
+    python -m benchmarks.rasa_stub --port 5005 --nlu-ms 40 --action-ms 10
+    python -m benchmarks.rasa_stub --error-rate 0.2 --slow-rate 0.05 --slow-ms 6000
+    python -m benchmarks.rasa_stub --nlu-ms 60 --latency-dist lognormal --latency-sigma 0.6
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from benchmarks._common import load_nlu_examples
+
+
+ENDPOINTS = ("webhook", "parse")
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class RasaStub:
+
+    def __init__(self, nlu_ms: float = 40.0, action_ms: float = 10.0,
+                 nlu_concurrency: int = 0, nlu_metadata: bool = True,
+                 faults: Optional[Dict[str, float]] = None, seed: int = 7,
+                 latency_dist: str = "fixed", latency_sigma: float = 0.5):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_dist must be one of {LATENCY_DISTRIBUTIONS}, got {latency_dist!r}")
+        self.nlu_delay = nlu_ms / 1000.0
+        self.action_delay = action_ms / 1000.0
+        self.nlu_metadata = nlu_metadata
+        self.nlu_concurrency = nlu_concurrency
+        self._nlu_slots: Optional[asyncio.Semaphore] = None
+        self.intents = {text.lower(): intent
+                        for intent, texts in load_nlu_examples().items() for text in texts}
+        self.nlu_calls = 0
+        self.faults = {endpoint: dict(faults or {}) for endpoint in ENDPOINTS}
+        self.injected = {"errors": 0, "invalid": 0, "slow": 0}
+        self._rng = random.Random(seed)
+        self.latency_dist = latency_dist
+        self.latency_sigma = latency_sigma
+
+    def _delay(self, mean: float) -> float:
+        """A sleep time (seconds) with the configured distribution around mean."""
+        if mean <= 0 or self.latency_dist == "fixed":
+            return mean
+        if self.latency_dist == "uniform":
+            return self._rng.uniform(0.0, 2.0 * mean)
+        if self.latency_dist == "exponential":
+            return self._rng.expovariate(1.0 / mean)
+        sigma = self.latency_sigma
+        return self._rng.lognormvariate(math.log(mean) - sigma * sigma / 2.0, sigma)
+
+    async def _inject(self, endpoint: str) -> Optional[web.Response]:
+        """Apply the endpoint's faults: maybe sleep, maybe return a 500 or a non-JSON 200 response."""
+        faults = self.faults[endpoint]
+        if self._rng.random() < faults.get("slow_rate", 0.0):
+            self.injected["slow"] += 1
+            await asyncio.sleep(faults.get("slow_ms", 0.0) / 1000.0)
+        if self._rng.random() < faults.get("error_rate", 0.0):
+            self.injected["errors"] += 1
+            return web.json_response({"error": "injected fault"}, status=500)
+        if self._rng.random() < faults.get("invalid_rate", 0.0):
+            self.injected["invalid"] += 1
+            return web.Response(text="<html><body>injected fault</body></html>", content_type="text/html")
+        return None
+
+    async def _nlu(self, text: str) -> dict:
+        if self._nlu_slots is None and self.nlu_concurrency > 0:
+            self._nlu_slots = asyncio.Semaphore(self.nlu_concurrency)
+        self.nlu_calls += 1
+        if self._nlu_slots is not None:
+            async with self._nlu_slots:
+                await asyncio.sleep(self._delay(self.nlu_delay))
+        else:
+            await asyncio.sleep(self._delay(self.nlu_delay))
+        intent = self.intents.get(text.strip().lower(), "nlu_fallback")
+        return {"text": text, "intent": {"name": intent, "confidence": 0.99}, "entities": []}
+
+    async def webhook(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        fault = await self._inject("webhook")
+        if fault is not None:
+            return fault
+        parse_data = await self._nlu(body.get("message", ""))
+        await asyncio.sleep(self._delay(self.action_delay))
+        messages = [{"recipient_id": body.get("sender"),
+                     "text": f"Answer for {parse_data['intent']['name']}"}]
+        if self.nlu_metadata:
+            messages.append({"recipient_id": body.get("sender"), "custom": {"nlu": {
+                "intent": parse_data["intent"], "entities": parse_data["entities"]}}})
+        if request.query.get("stream") != "true":
+            return web.json_response(messages)
+
+        # ?stream=true: newline-delimited JSON, one bot message per line, like Rasa's REST channel
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+        for msg in messages:
+            await resp.write(json.dumps(msg).encode("utf-8") + b"\n")
+        await resp.write_eof()
+        return resp
+
+    async def parse(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        fault = await self._inject("parse")
+        if fault is not None:
+            return fault
+        return web.json_response(await self._nlu(body.get("text", "")))
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"nlu_calls": self.nlu_calls, "injected": self.injected, "faults": self.faults})
+
+    async def set_faults(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        for endpoint in ENDPOINTS:
+            if endpoint in body:
+                self.faults[endpoint] = dict(body[endpoint])
+        shared = {key: value for key, value in body.items() if key not in ENDPOINTS}
+        if shared:
+            for endpoint in ENDPOINTS:
+                self.faults[endpoint] = dict(shared)
+        return web.json_response(self.faults)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/webhooks/rest/webhook", self.webhook)
+        app.router.add_post("/model/parse", self.parse)
+        app.router.add_get("/stats", self.stats)
+        app.router.add_post("/faults", self.set_faults)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--nlu-ms", type=float, default=40.0)
+    parser.add_argument("--action-ms", type=float, default=10.0)
+    parser.add_argument("--nlu-concurrency", type=int, default=0)
+    parser.add_argument("--no-nlu-metadata", action="store_true",
+                        help="do not append the actions' nlu custom message to webhook replies")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal shape")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered with HTTP 500")
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="share of calls answered with a 200 HTML page")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of calls delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    faults = {"error_rate": args.error_rate, "invalid_rate": args.invalid_rate,
+              "slow_rate": args.slow_rate, "slow_ms": args.slow_ms}
+    stub = RasaStub(args.nlu_ms, args.action_ms, args.nlu_concurrency, not args.no_nlu_metadata, faults,
+                    args.seed, args.latency_dist, args.latency_sigma)
+    web.run_app(stub.app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
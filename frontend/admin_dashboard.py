@@ -1,28 +1,52 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
-import sqlite3
 import json
 import os
 import time
+import requests
 
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))) 
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from pathlib import Path
+
+from backend.auth import create_admin_token
+from backend.db import engine
+from rasabot.actions.kb_bundle import build_bundle
 
 
 KB_FOLDER = "../rasabot/kb"
+API_URL = "http://127.0.0.1:8000"
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin123"
 PALETTE = ["#A1E3C3", "#D7BDE2", "#F7DC6F", "#85C1E9", "#F1948A", "#73C6B6", "#F5B041"]
 
-DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../backend/wellbot.db"))
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine)
+def db_connection():
+    """
+    DBAPI connection from the backend's pool (DATABASE_URL); close() returns it to the pool.
+    pandas only accepts SQLAlchemy >= 2.0 connectables, so it gets the raw connection.
+    """
+    return engine.raw_connection()
+
+
+def invalidate_backend_cache(user_ids):
+    """
+    Tell the backend to drop its cached data (e.g. profile language) for users edited here.
+    If the backend is down the entries still expire after their TTL.
+    """
+    try:
+        response = requests.post(
+            f"{API_URL}/admin/cache/invalidate",
+            json={"user_ids": list(user_ids)},
+            headers={"Authorization": f"Bearer {create_admin_token()}"},
+            timeout=3
+        )
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        # A toast, unlike st.warning, is still shown after the st.rerun() that follows a save
+        st.toast(f"Saved, but the backend cache could not be refreshed ({e}); changes apply within minutes.", icon="⚠️")
 
 
 def login_page():
@@ -81,6 +105,11 @@ def save_kb_file(file_path, data):
             json.dump(data, f, indent=2, ensure_ascii=False)
     except Exception as e:
         st.error(f"Error saving file: {e}")
+        return
+    try:
+        build_bundle(Path(file_path).parent)
+    except Exception as e:
+        st.warning(f"KB saved, but the KB bundle could not be rebuilt: {e}")
 
 
 def init_kb_session_keys():
@@ -141,7 +170,7 @@ def dashboard_page():
     # Analytics
     with tabs[0]:
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = db_connection()
             cursor = conn.cursor()
             
             #Total users
@@ -159,7 +188,7 @@ def dashboard_page():
 
             #Queries per day
             df_queries = pd.read_sql_query("""
-                SELECT DATE(timestamp) AS day, COUNT(*) AS Queries
+                SELECT DATE(timestamp) AS day, COUNT(*) AS "Queries"
                 FROM chat_history
                 GROUP BY day
                 ORDER BY day;
@@ -167,15 +196,15 @@ def dashboard_page():
 
             #Intent distribution
             df_intents = pd.read_sql_query("""
-                SELECT intent AS Intent, COUNT(*) AS Count
+                SELECT intent AS "Intent", COUNT(*) AS "Count"
                 FROM chat_history
                 GROUP BY intent
-                ORDER BY Count DESC;
+                ORDER BY "Count" DESC;
             """, conn)
             
             #Gender distribution
             df_gender = pd.read_sql_query("""
-                SELECT gender AS Gender, COUNT(*) AS Count
+                SELECT gender AS "Gender", COUNT(*) AS "Count"
                 FROM profiles
                 WHERE gender IS NOT NULL
                 GROUP BY gender;
@@ -183,7 +212,7 @@ def dashboard_page():
 
             #Language preference
             df_lang = pd.read_sql_query("""
-                SELECT language AS Language, COUNT(*) AS Count
+                SELECT language AS "Language", COUNT(*) AS "Count"
                 FROM profiles
                 WHERE language IS NOT NULL
                 GROUP BY language;
@@ -393,7 +422,7 @@ def dashboard_page():
         st.subheader("💬 User Feedback")
 
         try:
-            conn = sqlite3.connect(DB_PATH)
+            conn = db_connection()
             df_feedback = pd.read_sql_query("""
                 SELECT f.id, u.name AS user_name, f.user_query AS query, f.bot_response, f.feedback, f.timestamp
                 FROM feedback f
@@ -425,8 +454,9 @@ def dashboard_page():
         st.subheader("👥 User Management")
 
         from sqlalchemy.orm import Session
-        from backend.models import User, Profile, ChatHistory
+        from backend.models import User, Profile
         from backend.db import SessionLocal
+        from backend.history import HISTORY_PAGE_SIZE, fetch_history_page
         from werkzeug.security import generate_password_hash
 
         db = SessionLocal()
@@ -547,6 +577,7 @@ def dashboard_page():
                                     db.add(profile_obj)
 
                                 db.commit()
+                                invalidate_backend_cache([user_obj.id])
                                 st.success("✅ User updated successfully!")
                                 st.rerun()
                             except Exception as e:
@@ -572,6 +603,7 @@ def dashboard_page():
                         if user_obj:
                             db.delete(user_obj)
                         db.commit()
+                        invalidate_backend_cache([selected_user_id])
                         st.success("✅ User deleted successfully!")
                         st.rerun()
                     except Exception as e:
@@ -589,16 +621,33 @@ def dashboard_page():
             if selected_user_display != "Select a User":
                 selected_user_id = dict(user_options)[selected_user_display]
 
+                # One cursor per page shown so far; the last one is the current page
+                cursors_key = f"history_cursors_{selected_user_id}"
+                if cursors_key not in st.session_state:
+                    st.session_state[cursors_key] = [None]
+                cursors = st.session_state[cursors_key]
+
                 db = SessionLocal()
                 try:
-                    chats = db.query(ChatHistory).filter(ChatHistory.user_id == selected_user_id).order_by(ChatHistory.timestamp).all()
+                    chats, next_cursor = fetch_history_page(db, selected_user_id, HISTORY_PAGE_SIZE, cursors[-1])
                 finally:
                     db.close()
 
                 if chats:
-                    for chat in chats:
+                    st.caption(f"Page {len(cursors)} (newest first)")
+                    for chat in reversed(chats):
                         st.markdown(f"**User:** {chat.query}")
                         st.markdown(f"**Bot:** {chat.response}")
                         st.markdown("---")
+
+                    col_newer, col_older = st.columns([1, 1])
+                    with col_newer:
+                        if len(cursors) > 1 and st.button("⬅️ Newer messages", key="history_newer"):
+                            cursors.pop()
+                            st.rerun()
+                    with col_older:
+                        if next_cursor and st.button("Older messages ➡️", key="history_older"):
+                            cursors.append(next_cursor)
+                            st.rerun()
                 else:
                     st.info("No chat history for this user.")
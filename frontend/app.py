@@ -1,4 +1,5 @@
 import streamlit as st
+import json
 import re
 import requests
 
@@ -23,6 +24,43 @@ def is_valid_email(email):
     pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
     return re.match(pattern, email) is not None
 
+def bubble_html(message, is_user):
+    alignment = "right" if is_user else "left"
+    bg_color = "#DCF8C6" if is_user else "#E2E2E2"
+    return f"""
+            <div style="text-align:{alignment}; margin:8px 0;">
+                <span style="
+                    background-color:{bg_color};
+                    padding:10px 14px;
+                    border-radius:12px;
+                    display:inline-block;
+                    max-width:70%;
+                    word-wrap: break-word;
+                    font-size:14px;
+                ">
+                    {message}
+                </span>
+            </div>
+            """
+
+def load_recent_history(token):
+    """Most recent page of the user's saved conversation, oldest first, in chat_history format."""
+    try:
+        response = requests.get(
+            f"{API_URL}/history",
+            params={"limit": 20},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+    except requests.exceptions.RequestException:
+        return []
+    if response.status_code != 200:
+        return []
+    messages = []
+    for item in reversed(response.json().get("items", [])):
+        messages.append({"sender": "user", "message": item["query"], "history": True})
+        messages.append({"sender": "bot", "message": item["response"], "history": True})
+    return messages
+
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
 if "admin_logged_in" not in st.session_state:
@@ -43,6 +81,11 @@ if "user_input" not in st.session_state:
     st.session_state.user_input = ""
 if "feedback_submitted" not in st.session_state:
     st.session_state.feedback_submitted = {}
+if "pending_message" not in st.session_state:
+    st.session_state.pending_message = None
+if "http" not in st.session_state:
+    # One keep-alive connection per browser session, reused for every chat turn
+    st.session_state.http = requests.Session()
 
 if st.session_state.admin_logged_in:
     try:
@@ -78,6 +121,7 @@ if not st.session_state.logged_in:
                                 st.session_state.token = data.get("access_token")
                                 st.session_state.current_user = email
                                 st.session_state.user_id = data.get("user_id")
+                                st.session_state.chat_history = load_recent_history(st.session_state.token)
                                 st.success("✅ Logged in successfully!")
                                 st.rerun()
                             elif response.status_code == 401:
@@ -205,50 +249,47 @@ else:
         if user_message == "":
             return
         st.session_state.chat_history.append({"sender": "user", "message": user_message})
+        # Answered below, after the history is drawn, so the reply can be streamed into place
+        st.session_state.pending_message = user_message
+        st.session_state.user_input = ""
+
+    def stream_reply(user_message, placeholder):
+        """
+        Read the /predict_chat/stream events over the session's keep-alive connection,
+        updating the placeholder as each bot message arrives. Returns the full reply.
+        """
+        texts = []
         try:
-            headers = {"Authorization": f"Bearer {st.session_state.token}"}
-            response = requests.post(
-                f"{API_URL}/predict_chat",
+            with st.session_state.http.post(
+                f"{API_URL}/predict_chat/stream",
                 json={"user_id": st.session_state.user_id, "message": user_message},
-                headers=headers
-            )
-            if response.status_code == 200:
-                data = response.json()
-                bot_response = data.get("response", "🤖 Sorry, no response from bot.")
-            else:
-                bot_response = "🤖 Backend error. Please try again."
+                headers={"Authorization": f"Bearer {st.session_state.token}"},
+                stream=True,
+                timeout=(5, 60)
+            ) as response:
+                if response.status_code != 200:
+                    return "🤖 Backend error. Please try again."
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):])
+                    if event["type"] == "message":
+                        texts.append(event["text"])
+                        placeholder.markdown(bubble_html("\n".join(texts), is_user=False), unsafe_allow_html=True)
+                    elif event["type"] == "done":
+                        return event.get("response") or "\n".join(texts)
         except requests.exceptions.RequestException:
-            bot_response = "⚠️ Backend not reachable. Please try again later."
-
-        st.session_state.chat_history.append({"sender": "bot", "message": bot_response})
-        st.session_state.user_input = ""
+            if not texts:
+                return "⚠️ Backend not reachable. Please try again later."
+        return "\n".join(texts) or "🤖 Sorry, no response from bot."
 
     # ---- Render chat history ----
     for idx, chat in enumerate(st.session_state.chat_history):
         is_user = chat["sender"] == "user"
-        alignment = "right" if is_user else "left"
-        bg_color = "#DCF8C6" if is_user else "#E2E2E2"
 
-        st.markdown(
-            f"""
-            <div style="text-align:{alignment}; margin:8px 0;">
-                <span style="
-                    background-color:{bg_color};
-                    padding:10px 14px;
-                    border-radius:12px;
-                    display:inline-block;
-                    max-width:70%;
-                    word-wrap: break-word;
-                    font-size:14px;
-                ">
-                    {chat['message']}
-                </span>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        st.markdown(bubble_html(chat["message"], is_user), unsafe_allow_html=True)
 
-        if not is_user and idx not in st.session_state.feedback_submitted:
+        if not is_user and not chat.get("history") and idx not in st.session_state.feedback_submitted:
             col1, col2 = st.columns([1, 1])
             with col1:
                 if st.button("👍", key=f"up_{idx}"):
@@ -288,6 +329,13 @@ else:
                     except:
                         st.error("Failed to submit feedback.")
 
+    if st.session_state.pending_message:
+        user_message = st.session_state.pending_message
+        st.session_state.pending_message = None
+        bot_response = stream_reply(user_message, st.empty())
+        st.session_state.chat_history.append({"sender": "bot", "message": bot_response})
+        st.rerun()
+
     st.text_input(
         "Type your message here...",
         key="user_input",
@@ -1,12 +1,36 @@
-import json
-from pathlib import Path
-from typing import Any, Text, Dict, List
+import asyncio
+import os
+from typing import Any, Text, Dict, List, Optional, Tuple
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
 
-KB_PATH = Path(__file__).parent.parent / "kb"    
-DB_PATH = Path(__file__).parent.parent.parent / "backend" / "wellbot.db" 
+from .kb_bundle import load_bundle
+from .kb_store import KB_PATH, KB_STORE, KBIntent
+from .language import LANGUAGE_RESOLVER, detect_language, normalize_language
+from .response_cache import RESPONSE_CACHE
+
+load_bundle(KB_STORE)
+KB_STORE.load_all()
+
+NOT_FOUND_RESPONSE = {
+    "en": "Sorry, I couldn't find the information. Please consult a professional.",
+    "hi": "क्षमा करें, मैं जानकारी नहीं ढूंढ पाई। कृपया किसी विशेषज्ञ से परामर्श करें।"
+}
+
+# Append the turn's intent/entities as a {"custom": {"nlu": ...}} message, so the backend
+# does not need a second /model/parse call (RASA_PIPELINE_MODE=metadata)
+NLU_METADATA = os.getenv("ACTIONS_NLU_METADATA", "true").lower() in ("1", "true", "yes")
+
+
+def utter_nlu_metadata(dispatcher: CollectingDispatcher, tracker: Tracker) -> None:
+    if not NLU_METADATA:
+        return
+    latest = tracker.latest_message
+    dispatcher.utter_message(json_message={"nlu": {
+        "intent": latest.get("intent") or {},
+        "entities": latest.get("entities") or [],
+    }})
 
 
 class ActionFetchKB(Action):
@@ -14,93 +38,101 @@ class ActionFetchKB(Action):
     def name(self) -> Text:
         return "action_fetch_kb"
 
-    def get_user_language(self, tracker: Tracker) -> str:
+    async def get_user_language(self, tracker: Tracker) -> str:
         """
-        Always fetch language from DB first.
-        Only fallback to slot or message detection if DB fails (shouldn't happen).
+        Always fetch language from the user's profile first (cached per sender).
+        Only fallback to slot or message detection if there is no profile language.
         """
-        user_id = tracker.sender_id
-        language = None
-        conn = None
-        try:
-            import sqlite3
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT language FROM profiles WHERE id = ?", (user_id,))
-            row = cursor.fetchone()
-            if row and row[0]:
-                language = row[0].lower()
-        except Exception as e:
-            print(f"Error fetching language from DB: {e}")
-        finally:
-            if conn:
-                conn.close()
+        metadata = tracker.latest_message.get("metadata") or {}
+        language = await LANGUAGE_RESOLVER.aget(tracker.sender_id, metadata.get("profile_language"))
 
         if not language:
             language = tracker.get_slot("language") 
         if not language:
-            try:
-                from langdetect import detect
-                user_msg = tracker.latest_message.get("text", "")
-                lang_code = detect(user_msg)
-                language = "hi" if lang_code.startswith("hi") else "en"
-            except:
-                language = "en"
-
-        language_map = {"english": "en", "hindi": "hi"}
-        language = language_map.get(language.lower(), "en")
-        return language
-
-    def load_kb(self, intent: str) -> List[Dict[Text, Any]]:
-        """Load KB entries for a given intent"""
-        kb_file = KB_PATH / f"{intent}.json"
-        if not kb_file.exists():
-            print(f"[DEBUG] KB file not found: {kb_file}")
-            return []
-        with open(kb_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("entries", [])
+            language = detect_language(tracker.latest_message.get("text", ""))
+
+        return normalize_language(language) or "en"
 
-    def match_entry(self, tracker: Tracker, entries: List[Dict[Text, Any]]) -> Dict[Text, Any]:
+    async def load_kb(self, intent: str) -> Optional[KBIntent]:
+        """Get the in-memory KB for a given intent (reloaded only when the file changes)"""
+        kb = await KB_STORE.aget(intent)
+        if kb is None:
+            print(f"[DEBUG] KB file not found: {KB_PATH / f'{intent}.json'}")
+        return kb
+
+    def match_entry(self, tracker: Tracker, kb: Optional[KBIntent]) -> Optional[Dict[Text, Any]]:
         """Match user entity with KB entry ID or keywords"""
+        entries = kb.entries if kb else []
         entities = tracker.latest_message.get("entities", [])
         entity_values = [e.get("value", "").lower() for e in entities]
 
-        for entry in entries:
-            entry_id = entry.get("id", "").lower()
+        for entry, entry_id in zip(entries, kb.entry_ids if kb else []):
             for ev in entity_values:
                 if ev == entry_id:
                     return entry
 
         user_msg = tracker.latest_message.get("text", "").lower()
-        for entry in entries:
-            keywords = [k.lower() for k in entry.get("keywords", [])]
-            for kw in keywords:
-                if kw in user_msg:
-                    return entry
+        ranked = kb.rank_entries(user_msg) if kb else []
+        if ranked:
+            return entries[ranked[0][0]]
 
-        return {
-            "en": "Sorry, I couldn't find the information. Please consult a professional.",
-            "hi": "क्षमा करें, मैं जानकारी नहीं ढूंढ पाई। कृपया किसी विशेषज्ञ से परामर्श करें।"
-        }
+        return None
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    def response_cache_key(self, tracker: Tracker, intent: str, kb: Optional[KBIntent], language: str) -> Tuple:
+        """
+        Everything the answer depends on: intent, entities, language, the keywords found and the
+        query terms the BM25 index knows (none when a keyword pins the entry). Without a keyword
+        hit the cross-intent fallback may answer, so its keywords and terms are used instead.
+        """
+        entities = frozenset(e.get("value", "").lower() for e in tracker.latest_message.get("entities", []))
+        user_msg = tracker.latest_message.get("text", "").lower()
+        keywords, terms = kb.answer_inputs(user_msg) if kb else (frozenset(), None)
+        if terms is None:
+            return intent, entities, "*", KB_STORE.fallback_inputs(user_msg), language
+        return intent, entities, keywords, terms, language
+
+    async def search_other_kbs(self, tracker: Tracker, intent: str) -> Tuple[Optional[Dict[Text, Any]], Optional[str]]:
+        """Search every KB file when the predicted intent's KB has no match (e.g. misrouted intent)"""
+        user_msg = tracker.latest_message.get("text", "").lower()
+        # search_all may stat KB files for freshness, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, lambda: KB_STORE.search_all(user_msg, exclude_intent=intent, k=1))
+        if not results:
+            return None, None
+        source, entry, score = results[0]
+        print(f"[DEBUG] KB fallback for '{intent}' answered from '{source}' (score {score:.2f})")
+        return entry, source
+
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
         intent = tracker.latest_message.get("intent", {}).get("name")
         if not intent:
             dispatcher.utter_message(text="Sorry, I couldn't understand your question.")
             return []
 
-        entries = self.load_kb(intent)
-        matched_entry = self.match_entry(tracker, entries)
+        kb = await self.load_kb(intent)
+        language = await self.get_user_language(tracker)
+
+        cache_key = self.response_cache_key(tracker, intent, kb, language)
+        cached = RESPONSE_CACHE.get(cache_key, KB_STORE.versions())
+        if cached:
+            response_text, kb_source = cached
+        else:
+            matched_entry = self.match_entry(tracker, kb)
+            kb_source = intent if matched_entry else None
+            if not matched_entry:
+                matched_entry, kb_source = await self.search_other_kbs(tracker, intent)
+            if not matched_entry:
+                matched_entry = NOT_FOUND_RESPONSE
 
-        language = self.get_user_language(tracker)
-        response_text = matched_entry.get(language, matched_entry.get("en"))
+            response_text = matched_entry.get(language, matched_entry.get("en"))
+            RESPONSE_CACHE.put(cache_key, (response_text, kb_source))
 
         dispatcher.utter_message(text=response_text)
-        return [SlotSet("language", language)]
+        utter_nlu_metadata(dispatcher, tracker)
+        return [SlotSet("language", language), SlotSet("kb_source", kb_source)]
 
 
 class ActionMoodResponse(Action):
@@ -108,28 +140,15 @@ class ActionMoodResponse(Action):
     def name(self) -> Text:
         return "action_mood_response"
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: dict):
-
-        language = "en" 
-        user_id = tracker.sender_id
-        try:
-            import sqlite3
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute("SELECT language FROM profiles WHERE id = ?", (user_id,))
-            row = cursor.fetchone()
-            if row and row[0]:
-                language = "en" if row[0].lower() == "english" else "hi"
-        except Exception as e:
-            print(f"Error fetching language from DB: {e}")
-        finally:
-            if conn:
-                conn.close()
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: dict):
+
+        metadata = tracker.latest_message.get("metadata") or {}
+        language = await LANGUAGE_RESOLVER.aget(tracker.sender_id, metadata.get("profile_language"))
 
         if not language:
-            language = tracker.get_slot("language") or "en"
+            language = normalize_language(tracker.get_slot("language")) or "en"
 
         intent = tracker.latest_message.get('intent', {}).get('name')
 
@@ -143,5 +162,6 @@ class ActionMoodResponse(Action):
         if intent in responses:
             en_resp, hi_resp = responses[intent]
             dispatcher.utter_message(response=en_resp if language == "en" else hi_resp)
+        utter_nlu_metadata(dispatcher, tracker)
 
         return [SlotSet("language", language)]
@@ -0,0 +1,109 @@
+"""
+Precompiled binary bundle of the KB files.
+
+Layout: MAGIC | format version (u16) | header length (u32) | JSON header | pickle payload.
+The header lists every source file with its size, mtime and sha1. The payload holds each
+intent's entries, interned ids/keywords, keyword automaton and BM25 index, plus the
+cross-intent fallback index, as plain builtins.
+The action server maps the file and installs the prebuilt intents, skipping JSON parsing and
+index construction at startup.
+
+Rebuild with:  python -m actions.kb_bundle   (from rasabot/)
+"""
+import hashlib
+import json
+import mmap
+import pickle
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .kb_store import KB_PATH, GlobalKB, KBIntent, KBStore
+
+BUNDLE_PATH = KB_PATH / "kb.bundle"
+BUNDLE_MAGIC = b"WBKB"
+BUNDLE_FORMAT = 2
+_PREFIX = struct.Struct("<4sHI")
+
+
+def build_bundle(kb_path: Path = KB_PATH, bundle_path: Optional[Path] = None) -> Path:
+    """Compile every <intent>.json in kb_path into one bundle, written atomically."""
+    kb_path = Path(kb_path)
+    bundle_path = Path(bundle_path) if bundle_path else kb_path / BUNDLE_PATH.name
+    sources: Dict[str, Dict] = {}
+    intents: Dict[str, Dict] = {}
+    kbs: List[KBIntent] = []
+
+    for kb_file in sorted(kb_path.glob("*.json")):
+        raw = kb_file.read_bytes()
+        st = kb_file.stat()
+        digest = hashlib.sha1(raw).hexdigest()
+        entries = json.loads(raw.decode("utf-8")).get("entries", [])
+        kb = KBIntent(kb_file.stem, entries, st.st_mtime_ns, st.st_size, digest, version=1)
+        intents[kb.intent] = kb.to_state()
+        kbs.append(kb)
+        sources[kb.intent] = {"file": kb_file.name, "size": st.st_size,
+                              "mtime_ns": st.st_mtime_ns, "sha1": digest}
+
+    header = json.dumps({"format": BUNDLE_FORMAT, "built_at": time.time(),
+                         "pickle_protocol": pickle.HIGHEST_PROTOCOL,
+                         "sources": sources}).encode("utf-8")
+    payload = pickle.dumps({"intents": intents, "global": GlobalKB(kbs).to_state() if kbs else None},
+                           protocol=pickle.HIGHEST_PROTOCOL)
+
+    tmp_path = bundle_path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(BUNDLE_MAGIC, BUNDLE_FORMAT, len(header)))
+        f.write(header)
+        f.write(payload)
+    tmp_path.replace(bundle_path)
+    return bundle_path
+
+
+def load_bundle(store: KBStore, bundle_path: Optional[Path] = None) -> List[str]:
+    """
+    Install the intents from the bundle whose source files are unchanged on disk.
+    Returns the loaded intent names; stale or missing entries are left to the JSON path.
+    """
+    bundle_path = Path(bundle_path) if bundle_path else store.kb_path / BUNDLE_PATH.name
+    if not bundle_path.exists():
+        return []
+    try:
+        with open(bundle_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, fmt, header_len = _PREFIX.unpack_from(mm, 0)
+            if magic != BUNDLE_MAGIC or fmt != BUNDLE_FORMAT:
+                print(f"[DEBUG] Ignoring KB bundle {bundle_path}: unsupported format")
+                return []
+            offset = _PREFIX.size
+            header = json.loads(mm[offset:offset + header_len].decode("utf-8"))
+
+            fresh = []
+            for intent, src in header["sources"].items():
+                try:
+                    st = (store.kb_path / src["file"]).stat()
+                except OSError:
+                    continue
+                if st.st_size == src["size"] and st.st_mtime_ns == src["mtime_ns"]:
+                    fresh.append(intent)
+            if not fresh:
+                return []
+
+            with memoryview(mm) as view:
+                payload = pickle.loads(view[offset + header_len:])
+    except (OSError, ValueError, struct.error, pickle.UnpicklingError) as e:
+        print(f"[DEBUG] Could not read KB bundle {bundle_path}: {e}")
+        return []
+
+    for intent in fresh:
+        store.put(KBIntent.from_state(payload["intents"][intent]))
+    # The prebuilt cross-intent index is only valid when every source file is unchanged
+    if payload.get("global") and len(fresh) == len(header["sources"]):
+        store.put_global(payload["global"])
+    print(f"[DEBUG] Loaded {len(fresh)} KB intents from bundle {bundle_path.name}")
+    return fresh
+
+
+if __name__ == "__main__":
+    path = build_bundle()
+    print(f"Wrote {path} ({path.stat().st_size} bytes)")
@@ -0,0 +1,146 @@
+import heapq
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple
+
+KB_RANKING = os.getenv("KB_RANKING", "bm25")  # "bm25" or "first_match"
+KB_TOP_K = int(os.getenv("KB_TOP_K", "5"))
+# Messages without a keyword hit are only answered from BM25 when the best entry scores
+# KB_MIN_SCORE and shares KB_MIN_TERMS query terms. Calibrated with bench_kb_match on the
+# nlu.yml examples: at 4.0 / 1 term, 51% of other intents' examples got an answer; at
+# 6.0 / 2 terms 11% do, while 67% of the intent's own examples are still answered.
+KB_MIN_SCORE = float(os.getenv("KB_MIN_SCORE", "6.0"))
+KB_MIN_TERMS = int(os.getenv("KB_MIN_TERMS", "2"))
+
+# Field weights: keywords and ids are curated, the answers are long prose
+FIELD_WEIGHTS = {"id": 2.0, "keywords": 3.0, "en": 1.0, "hi": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_QUERY_TOKENS = 32
+
+_DEVANAGARI_RUN = re.compile(r"[ऀ-ॿ]+")
+_LATIN_TOKEN = re.compile(r"[a-z0-9]+")
+_HINDI_TOKEN = re.compile(r"[ऀ-ॣ०-ॿ]+")
+
+EN_STOPWORDS = frozenset("""
+a an and are as at be but by can could do does for from had has have how i if in
+is it its me my of on or our please should so than that the their them then there
+these they this to was we what when where which who why will with you your yours
+about am any been being did get got into just more most much no not now only other
+some such too very would also tell know want need
+""".split())
+
+HI_STOPWORDS = frozenset("""
+है हैं था थे थी हो होता होती होते होना में से को का की के और या पर भी तो ही
+यह ये वह वे इस उस इन उन मैं मेरा मेरी मेरे मुझे हम आप आपको क्या कैसे क्यों कब
+कौन कहाँ कहां एक लिए साथ बारे बताएं बताओ बताइए चाहिए करें करे करना कर रहा रही रहे
+""".split())
+
+
+def _normalize_hi(token: str) -> str:
+    # Drop nukta and fold chandrabindu to anusvara so common spelling variants meet
+    return token.replace("़", "").replace("ँ", "ं")
+
+
+def _stem_en(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenize mixed Hindi/English text, handling each script separately."""
+    text = (text or "").lower()
+    tokens: List[str] = []
+    for tok in _HINDI_TOKEN.findall(text):
+        tok = _normalize_hi(tok)
+        if tok and tok not in HI_STOPWORDS:
+            tokens.append(tok)
+    latin = _DEVANAGARI_RUN.sub(" ", text).replace("_", " ")
+    for tok in _LATIN_TOKEN.findall(latin):
+        if tok not in EN_STOPWORDS:
+            tokens.append(_stem_en(tok))
+    return tokens
+
+
+class BM25Index:
+    """
+    Inverted index over the id, keywords and en/hi answers of one KB file.
+    Lookups only touch the postings of the query terms and keep a k-sized heap,
+    so cost is bounded by the query length rather than the number of entries.
+    """
+
+    def __init__(self, entries: Sequence[Dict[Text, Any]]):
+        self.n_docs = len(entries)
+        self.doc_len: List[float] = []
+        postings: Dict[str, List[Tuple[int, float]]] = {}
+
+        for doc_id, entry in enumerate(entries):
+            tf: Counter = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                value = entry.get(field, "")
+                if isinstance(value, list):
+                    value = " ".join(value)
+                for tok in tokenize(str(value)):
+                    tf[tok] += weight
+            self.doc_len.append(sum(tf.values()))
+            for tok, freq in tf.items():
+                postings.setdefault(tok, []).append((doc_id, freq))
+
+        self.avgdl = (sum(self.doc_len) / self.n_docs) if self.n_docs else 0.0
+        self.postings = postings
+        self.doc_norm = [
+            BM25_K1 * (1 - BM25_B + BM25_B * dl / self.avgdl) if self.avgdl else BM25_K1
+            for dl in self.doc_len
+        ]
+        self.idf = {
+            tok: math.log(1 + (self.n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for tok, plist in postings.items()
+        }
+
+    _STATE_KEYS = ("n_docs", "doc_len", "doc_norm", "avgdl", "postings", "idf")
+
+    def to_state(self) -> Dict[str, Any]:
+        """Plain-data form of the index, used by the KB bundle."""
+        return {key: getattr(self, key) for key in self._STATE_KEYS}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "BM25Index":
+        index = cls.__new__(cls)
+        for key in cls._STATE_KEYS:
+            setattr(index, key, state[key])
+        return index
+
+    def search(self, text: str, k: int = 5, candidates: Optional[Sequence[int]] = None,
+               deadline: Optional[float] = None, min_terms: int = 1) -> List[Tuple[int, float]]:
+        """
+        Return up to k (entry index, score) pairs, best first.
+        Entries sharing fewer than min_terms distinct query terms are left out.
+        With a perf_counter() deadline, scoring stops after the posting list that crosses it.
+        """
+        if not self.n_docs:
+            return []
+        allowed = set(candidates) if candidates is not None else None
+        scores: Dict[int, float] = {}
+        terms: Counter = Counter()
+        for tok in set(tokenize(text)[:MAX_QUERY_TOKENS]):
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            plist = self.postings.get(tok)
+            if not plist:
+                continue
+            idf = self.idf[tok] * (BM25_K1 + 1)
+            for doc_id, freq in plist:
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq / (freq + self.doc_norm[doc_id])
+                terms[doc_id] += 1
+        if min_terms > 1:
+            scores = {doc_id: score for doc_id, score in scores.items() if terms[doc_id] >= min_terms}
+        # Ties are broken by KB order, as the first-match lookup did
+        return heapq.nsmallest(k, ((d, s) for d, s in scores.items()), key=lambda x: (-x[1], x[0]))
@@ -0,0 +1,263 @@
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Text, Tuple
+
+from .kb_search import KB_MIN_SCORE, KB_MIN_TERMS, KB_RANKING, KB_TOP_K, MAX_QUERY_TOKENS, BM25Index, tokenize
+from .keyword_matcher import KeywordAutomaton
+
+KB_PATH = Path(__file__).parent.parent / "kb"
+KB_RELOAD_INTERVAL = float(os.getenv("KB_RELOAD_INTERVAL", "2"))
+KB_FALLBACK_BUDGET_MS = float(os.getenv("KB_FALLBACK_BUDGET_MS", "5"))
+
+
+class KBIntent:
+    """Parsed KB file for one intent with pre-lowercased ids, a keyword automaton and a BM25 index."""
+
+    def __init__(self, intent: str, entries: List[Dict[Text, Any]],
+                 mtime_ns: int, size: int, digest: str, version: int, whole_words: bool = False):
+        self.intent = intent
+        self.entries = entries
+        self.entry_ids = [sys.intern(str(e.get("id", "")).lower()) for e in entries]
+        self.keywords = [[sys.intern(k.lower()) for k in e.get("keywords", [])] for e in entries]
+        self.matcher = KeywordAutomaton(self.keywords, whole_words)
+        self.index = BM25Index(entries)
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+        self.version = version
+
+    def to_state(self) -> Dict[str, Any]:
+        """Plain-data form (builtins only) so the bundle does not depend on module paths."""
+        return {
+            "intent": self.intent, "entries": self.entries, "entry_ids": self.entry_ids,
+            "keywords": self.keywords, "matcher": self.matcher.to_state(),
+            "index": self.index.to_state(), "mtime_ns": self.mtime_ns,
+            "size": self.size, "digest": self.digest,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], version: int = 1) -> "KBIntent":
+        kb = cls.__new__(cls)
+        for key in ("intent", "entries", "entry_ids", "keywords", "mtime_ns", "size", "digest"):
+            setattr(kb, key, state[key])
+        kb.matcher = KeywordAutomaton.from_state(state["matcher"])
+        kb.index = BM25Index.from_state(state["index"])
+        kb.version = version
+        return kb
+
+    def rank_entries(self, user_msg: str, k: int = KB_TOP_K,
+                     deadline: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        Top-k (entry index, score) for a lowercased message.
+        Entries whose keywords occur in the message are ranked by BM25 among themselves;
+        without a keyword hit, the best BM25 matches with KB_MIN_SCORE and KB_MIN_TERMS are returned.
+        """
+        hits = self.matcher.matched_entries(user_msg)
+        if KB_RANKING == "first_match":
+            return [(min(hits), 0.0)] if hits else []
+        if hits:
+            ranked = self.index.search(user_msg, k=k, candidates=hits, deadline=deadline)
+            return ranked or [(min(hits), 0.0)]
+        ranked = self.index.search(user_msg, k=k, deadline=deadline, min_terms=KB_MIN_TERMS)
+        return [(idx, score) for idx, score in ranked if score >= KB_MIN_SCORE]
+
+    def answer_inputs(self, user_msg: str, scored: bool = False) -> Tuple[FrozenSet[str], Optional[FrozenSet[str]]]:
+        """
+        What rank_entries() depends on for a lowercased message: the keywords found and the
+        query terms in the BM25 vocabulary. The terms are empty when the keywords pin a single
+        entry (unless the caller needs its score), and None when no keyword matched.
+        """
+        pattern_ids = self.matcher.find_patterns(user_msg)
+        keywords = frozenset(self.matcher.patterns[pid] for pid in pattern_ids)
+        if not pattern_ids:
+            return keywords, None
+        hits = {idx for pid in pattern_ids for idx in self.matcher.pattern_entries[pid]}
+        if not scored and (len(hits) == 1 or KB_RANKING == "first_match"):
+            return keywords, frozenset()
+        return keywords, self.query_terms(user_msg)
+
+    def query_terms(self, user_msg: str) -> FrozenSet[str]:
+        """The query terms BM25 scores (see BM25Index.search); words it does not know are left out."""
+        postings = self.index.postings
+        return frozenset(tok for tok in tokenize(user_msg)[:MAX_QUERY_TOKENS] if tok in postings)
+
+
+class GlobalKB:
+    """
+    One KBIntent over the entries of every intent, used when the predicted intent misses.
+    Its keywords only match whole words: the message was not routed to these KBs, so a
+    short keyword inside an unrelated word ("di" in "dinner") must not pull in an answer.
+    """
+
+    def __init__(self, kbs: List[KBIntent]):
+        entries: List[Dict[Text, Any]] = []
+        self.owners: List[Tuple[str, int]] = []
+        for kb in kbs:
+            for idx, entry in enumerate(kb.entries):
+                entries.append(entry)
+                self.owners.append((kb.intent, idx))
+        self.versions = {kb.intent: kb.version for kb in kbs}
+        self.kb = KBIntent("*", entries, 0, 0, "", 1, whole_words=True)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"owners": self.owners, "kb": self.kb.to_state()}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], versions: Dict[str, int]) -> "GlobalKB":
+        global_kb = cls.__new__(cls)
+        global_kb.owners = [tuple(owner) for owner in state["owners"]]
+        global_kb.versions = dict(versions)
+        global_kb.kb = KBIntent.from_state(state["kb"])
+        return global_kb
+
+
+class KBStore:
+    """
+    Process-wide cache of the KB files in rasabot/kb.
+    Files are parsed once and only re-read when their mtime/size changes,
+    and only re-parsed when the content hash changes as well.
+    Stat checks are throttled to one per KB_RELOAD_INTERVAL seconds per intent.
+    """
+
+    def __init__(self, kb_path: Path = KB_PATH, reload_interval: float = KB_RELOAD_INTERVAL):
+        self.kb_path = Path(kb_path)
+        self.reload_interval = reload_interval
+        self._intents: Dict[str, KBIntent] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._global: Optional[GlobalKB] = None
+        self._global_rebuilding = False
+
+    def intents(self) -> List[str]:
+        return sorted(self._intents)
+
+    def put(self, kb: KBIntent) -> None:
+        """Install an already built KB (e.g. from the binary bundle)."""
+        with self._lock:
+            cached = self._intents.get(kb.intent)
+            if cached is not None:
+                kb.version = cached.version + 1
+            self._intents[kb.intent] = kb
+            self._checked_at[kb.intent] = time.monotonic()
+
+    def load_all(self) -> None:
+        """Load every KB file in the folder that is not already loaded and up to date."""
+        if not self.kb_path.exists():
+            return
+        for kb_file in sorted(self.kb_path.glob("*.json")):
+            self.get(kb_file.stem, force=True)
+        if self._global is None or self._global.versions != self.versions():
+            self._rebuild_global()
+
+    def versions(self) -> Dict[str, int]:
+        return {intent: kb.version for intent, kb in self._intents.items()}
+
+    def put_global(self, state: Dict[str, Any]) -> None:
+        """Install a prebuilt cross-intent index matching the currently loaded intents."""
+        self._global = GlobalKB.from_state(state, self.versions())
+
+    async def aget(self, intent: str) -> Optional[KBIntent]:
+        """
+        Async version of get(): answers from memory when no reload check is due,
+        otherwise runs the stat/read/parse in a worker thread so the event loop never blocks on disk.
+        """
+        cached = self._intents.get(intent)
+        if cached is not None and time.monotonic() - self._checked_at.get(intent, 0.0) < self.reload_interval:
+            return cached
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get, intent)
+
+    def get(self, intent: str, force: bool = False) -> Optional[KBIntent]:
+        """Return the KB for an intent, reloading it if the file changed on disk."""
+        now = time.monotonic()
+        cached = self._intents.get(intent)
+        if not force and cached is not None and now - self._checked_at.get(intent, 0.0) < self.reload_interval:
+            return cached
+
+        with self._lock:
+            self._checked_at[intent] = now
+            cached = self._intents.get(intent)
+            kb_file = self.kb_path / f"{intent}.json"
+            try:
+                st = kb_file.stat()
+            except OSError:
+                if cached is not None:
+                    print(f"[DEBUG] KB file removed: {kb_file}")
+                self._intents.pop(intent, None)
+                return None
+
+            if cached is not None and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+                return cached
+
+            raw = kb_file.read_bytes()
+            digest = hashlib.sha1(raw).hexdigest()
+            if cached is not None and cached.digest == digest:
+                cached.mtime_ns, cached.size = st.st_mtime_ns, st.st_size
+                return cached
+
+            try:
+                data = json.loads(raw.decode("utf-8"))
+            except ValueError as e:
+                print(f"[DEBUG] Could not parse KB file {kb_file}: {e}")
+                return cached
+
+            version = cached.version + 1 if cached is not None else 1
+            kb = KBIntent(intent, data.get("entries", []), st.st_mtime_ns, st.st_size, digest, version)
+            self._intents[intent] = kb
+            print(f"[DEBUG] Loaded KB '{intent}' v{version} ({len(kb.entries)} entries)")
+            return kb
+
+    def _rebuild_global(self) -> None:
+        try:
+            kbs = [self._intents[i] for i in sorted(self._intents)]
+            self._global = GlobalKB(kbs) if kbs else None
+        finally:
+            self._global_rebuilding = False
+
+    def _current_global(self) -> Optional[GlobalKB]:
+        """The cross-intent index; stale copies keep serving while a rebuild runs in the background."""
+        for intent in list(self._intents):
+            self.get(intent)
+        global_kb = self._global
+        if global_kb is None or global_kb.versions != self.versions():
+            with self._lock:
+                start = not self._global_rebuilding
+                self._global_rebuilding = True
+            if start:
+                threading.Thread(target=self._rebuild_global, daemon=True).start()
+        return global_kb
+
+    def fallback_inputs(self, user_msg: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        """(keywords, query terms) the cross-intent search_all() depends on, for cache keys."""
+        global_kb = self._global
+        if global_kb is None:
+            return frozenset(), frozenset(tokenize(user_msg))
+        keywords, terms = global_kb.kb.answer_inputs(user_msg, scored=True)
+        return keywords, terms if terms is not None else global_kb.kb.query_terms(user_msg)
+
+    def search_all(self, user_msg: str, exclude_intent: Optional[str] = None, k: int = KB_TOP_K,
+                   budget_ms: float = KB_FALLBACK_BUDGET_MS) -> List[Tuple[str, Dict[Text, Any], float]]:
+        """
+        Search every KB file at once and return (intent, entry, score), best first.
+        Entries from exclude_intent (the one that already missed) are skipped, and so are
+        keyword hits scoring below KB_MIN_SCORE. Scoring stops once the latency budget is used up.
+        """
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        global_kb = self._current_global()
+        if global_kb is None:
+            return []
+        results = []
+        for doc_id, score in global_kb.kb.rank_entries(user_msg, k=k * 2, deadline=deadline):
+            intent = global_kb.owners[doc_id][0]
+            if intent != exclude_intent and score >= KB_MIN_SCORE:
+                results.append((intent, global_kb.kb.entries[doc_id], score))
+        return results[:k]
+
+
+KB_STORE = KBStore()
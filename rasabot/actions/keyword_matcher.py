@@ -0,0 +1,119 @@
+import unicodedata
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over the (already lowercased) keywords of a KB.
+    A single pass over the message finds every keyword that occurs in it,
+    so matching no longer depends on entries x keywords substring scans.
+    Works on code points, which keeps Devanagari keywords (including
+    matras and halant) behaving exactly like the old `kw in user_msg` check.
+    With whole_words, a keyword only counts where it starts and ends on a word
+    boundary ("di" does not match "dinner", "sleep" does not match "sleeping").
+    """
+
+    def __init__(self, keyword_lists: Sequence[Sequence[str]], whole_words: bool = False):
+        self.whole_words = whole_words
+        self.patterns: List[str] = []
+        self.pattern_entries: List[Tuple[int, ...]] = []
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Tuple[int, ...]] = [()]
+
+        pattern_ids: Dict[str, int] = {}
+        entries_for: List[List[int]] = []
+        for entry_idx, keywords in enumerate(keyword_lists):
+            for kw in keywords:
+                pid = pattern_ids.get(kw)
+                if pid is None:
+                    pid = pattern_ids[kw] = len(self.patterns)
+                    self.patterns.append(kw)
+                    entries_for.append([])
+                    self._insert(kw, pid)
+                if not entries_for[pid] or entries_for[pid][-1] != entry_idx:
+                    entries_for[pid].append(entry_idx)
+        self.pattern_entries = [tuple(e) for e in entries_for]
+        self._build_failure_links()
+
+    def to_state(self) -> Dict[str, Any]:
+        """Plain-data form of the automaton, used by the KB bundle."""
+        return {"patterns": self.patterns, "pattern_entries": self.pattern_entries,
+                "goto": self.goto, "fail": self.fail, "out": self.out, "whole_words": self.whole_words}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "KeywordAutomaton":
+        automaton = cls.__new__(cls)
+        for key in ("patterns", "pattern_entries", "goto", "fail", "out", "whole_words"):
+            setattr(automaton, key, state[key])
+        return automaton
+
+    def _insert(self, pattern: str, pid: int) -> None:
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            node = nxt
+        self.out[node] = self.out[node] + (pid,)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find_patterns(self, text: str) -> Set[int]:
+        """Return the ids of all keywords occurring in text."""
+        goto, fail, out = self.goto, self.fail, self.out
+        found: Set[int] = set(out[0])
+        node = 0
+        for end, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                if self.whole_words:
+                    found.update(pid for pid in out[node] if self._on_boundaries(text, end, len(self.patterns[pid])))
+                else:
+                    found.update(out[node])
+        return found
+
+    @staticmethod
+    def _on_boundaries(text: str, end: int, length: int) -> bool:
+        """Whether text[end - length + 1:end + 1] is not part of a longer word."""
+        start = end - length + 1
+        return (start == 0 or not _is_word_char(text[start - 1])) and \
+            (end + 1 == len(text) or not _is_word_char(text[end + 1]))
+
+    def matched_entries(self, text: str) -> Set[int]:
+        """Return the indices of all entries with at least one keyword in text."""
+        entries: Set[int] = set()
+        for pid in self.find_patterns(text):
+            entries.update(self.pattern_entries[pid])
+        return entries
+
+    def first_entry(self, text: str) -> Optional[int]:
+        """Index of the first entry (in KB order) with a keyword in text, like the old loop."""
+        entries = self.matched_entries(text)
+        return min(entries) if entries else None
+
+    def keywords_in(self, text: str) -> Iterable[str]:
+        return (self.patterns[pid] for pid in self.find_patterns(text))
+
+
+def _is_word_char(ch: str) -> bool:
+    # Devanagari vowel signs and the halant are marks (M*), not alphanumerics, but still part of the word
+    return ch.isalnum() or unicodedata.category(ch)[0] == "M"
@@ -0,0 +1,207 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+DB_PATH = Path(__file__).parent.parent.parent / "backend" / "wellbot.db"
+# Same variable as the backend; a sqlite:/// URL is read with sqlite3, anything else via SQLAlchemy
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
+LANGUAGE_CACHE_TTL = float(os.getenv("LANGUAGE_CACHE_TTL", "300"))
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", "10000"))
+
+LANGUAGE_MAP = {"english": "en", "hindi": "hi", "en": "en", "hi": "hi"}
+
+# Share of letters that must be Devanagari for a message to count as Hindi
+DEVANAGARI_RATIO = float(os.getenv("DEVANAGARI_RATIO", "0.3"))
+# Share of Latin words that must be romanized Hindi for Hinglish to count as Hindi
+HINGLISH_RATIO = float(os.getenv("HINGLISH_RATIO", "0.4"))
+
+_LATIN_WORD = re.compile(r"[a-z]+")
+
+# Romanized Hindi function words and common health vocabulary. Words that are
+# also frequent in English ("me", "to", "the", "par", "sir") are deliberately left out.
+HINGLISH_WORDS = frozenset("""
+mujhe mujhko mera meri mere hum humein hamara aap aapka aapki aapko tum tumhe tera teri
+kya kyu kyun kaise kaisa kaisi kab kahan kaha kaun kitna kitni kitne
+hai hain hota hoti hote hona hua hui hue tha thi raha rahi rahe rha rhi hun hoon hu
+nahi nahin nhi bahut bohot thoda thodi zyada jyada accha acha achha theek thik sab
+aur ya lekin phir bhi sirf abhi kal aaj ke ki ka ko se mein mai ne wala wali
+karna karo karu karun kare karein kijiye karta karti kar chahiye sakta sakti sakte
+batao bataiye bataye bataen samjhao madad ilaaj ilaj dawai dawa upay
+dard bukhar bukhaar sardi khansi zukam jukam sar pet kamar gala galaa dil
+thakan kamzori neend chinta tanav ghabrahat udaas dukhi khush pareshan
+""".split())
+
+
+def normalize_language(language: Optional[str]) -> Optional[str]:
+    """Map profile/slot values like 'English' or 'hi' to 'en'/'hi'."""
+    if not language:
+        return None
+    return LANGUAGE_MAP.get(str(language).strip().lower())
+
+
+def detect_language(text: str) -> str:
+    """
+    Deterministic 'en'/'hi' detection for user messages.
+    Devanagari messages are Hindi once enough of their letters are Devanagari;
+    Latin-script messages are Hindi when enough of their words are romanized Hindi.
+    """
+    devanagari = latin = 0
+    for ch in text:
+        if "\u0900" <= ch <= "\u097f":
+            devanagari += 1
+        elif ch.isalpha():
+            latin += 1
+    letters = devanagari + latin
+    if not letters:
+        return "en"
+    if devanagari / letters >= DEVANAGARI_RATIO:
+        return "hi"
+
+    words = _LATIN_WORD.findall(text.lower())
+    if len(words) >= 2:
+        hinglish = sum(1 for w in words if w in HINGLISH_WORDS)
+        if hinglish / len(words) >= HINGLISH_RATIO:
+            return "hi"
+    return "en"
+
+
+class LanguageResolver:
+    """
+    Resolves a sender's profile language for the action server.
+    Keeps one long-lived read-only SQLite connection (or a one-connection SQLAlchemy pool for
+    a server database) and a TTL/LRU cache keyed by sender_id.
+    The backend sends the profile language as `profile_language` message metadata when the
+    user has set one, so a value that differs from the cached one (e.g. after PUT /profile)
+    replaces the entry immediately. No hint means no profile language (or an older client),
+    and the database decides.
+    """
+
+    def __init__(self, database: Union[str, Path] = DATABASE_URL, ttl: float = LANGUAGE_CACHE_TTL,
+                 maxsize: int = LANGUAGE_CACHE_SIZE):
+        self.db_path: Optional[Path] = None
+        self.db_url: Optional[str] = None
+        if isinstance(database, Path):
+            self.db_path = database.resolve()
+        elif database.startswith("sqlite:///"):
+            # Relative to the working directory, as SQLAlchemy reads it; as_uri() needs it absolute
+            self.db_path = Path(database[len("sqlite:///"):]).resolve()
+        else:
+            self.db_url = database
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._engine = None
+        self._db_errors: Tuple[type, ...] = (sqlite3.Error,)
+        self._lock = threading.Lock()
+        # One worker owns the connection, so DB reads never run on the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="language-db")
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                f"{self.db_path.as_uri()}?mode=ro", uri=True, check_same_thread=False, timeout=5
+            )
+        return self._conn
+
+    def _server_engine(self):
+        if self._engine is None:
+            from sqlalchemy import create_engine
+            from sqlalchemy.exc import SQLAlchemyError
+
+            self._db_errors = (sqlite3.Error, SQLAlchemyError)
+            self._engine = create_engine(self.db_url, pool_size=1, max_overflow=0, pool_pre_ping=True)
+        return self._engine
+
+    def _query(self, sender_id: str) -> Optional[str]:
+        user_id = int(sender_id) if sender_id.isdigit() else sender_id
+        try:
+            if self.db_path is not None:
+                row = self._connection().execute(
+                    "SELECT language FROM profiles WHERE user_id = ?", (user_id,)
+                ).fetchone()
+            else:
+                from sqlalchemy import text
+
+                with self._server_engine().connect() as conn:
+                    row = conn.execute(
+                        text("SELECT language FROM profiles WHERE user_id = :user_id"), {"user_id": user_id}
+                    ).fetchone()
+        except self._db_errors as e:
+            print(f"Error fetching language from DB: {e}")
+            self.close()
+            raise
+        return normalize_language(row[0]) if row and row[0] else None
+
+    def _store(self, sender_id: str, language: Optional[str]) -> None:
+        self._cache[sender_id] = (time.monotonic() + self.ttl, language)
+        self._cache.move_to_end(sender_id)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def get(self, sender_id: str, hint: Optional[str] = None) -> Optional[str]:
+        """
+        Return 'en'/'hi' for the sender, or None if there is no profile language.
+        `hint` is the language the backend sent with the message, if any.
+        """
+        sender_id = str(sender_id)
+        hint = normalize_language(hint)
+        with self._lock:
+            if hint:
+                cached = self._cache.get(sender_id)
+                if cached is None or cached[1] != hint:
+                    self._store(sender_id, hint)
+                return hint
+
+            cached = self._cache.get(sender_id)
+            if cached is not None and cached[0] > time.monotonic():
+                self._cache.move_to_end(sender_id)
+                self.hits += 1
+                return cached[1]
+
+            self.misses += 1
+            try:
+                language = self._query(sender_id)
+            except self._db_errors:
+                return None
+            self._store(sender_id, language)
+            return language
+
+    async def aget(self, sender_id: str, hint: Optional[str] = None) -> Optional[str]:
+        """
+        Async version of get() for the action server event loop.
+        Hints and fresh cache entries are answered inline; only misses hop to the DB thread.
+        """
+        cached = self._cache.get(str(sender_id))
+        if normalize_language(hint) or (cached is not None and cached[0] > time.monotonic()):
+            return self.get(sender_id, hint)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.get, sender_id, hint)
+
+    def invalidate(self, sender_id: Optional[str] = None) -> None:
+        with self._lock:
+            if sender_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(str(sender_id), None)
+
+    def close(self) -> None:
+        if self._engine is not None:
+            self._engine.dispose()
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            finally:
+                self._conn = None
+
+
+LANGUAGE_RESOLVER = LanguageResolver()
@@ -0,0 +1,64 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+RESPONSE_CACHE_LOG_EVERY = int(os.getenv("RESPONSE_CACHE_LOG_EVERY", "1000"))
+
+
+class ResponseCache:
+    """
+    Bounded LRU of rendered KB answers.
+    Keys are built by the action from (intent, entities, matched keywords, known query terms, language).
+    The whole cache is dropped as soon as any KB file version changes.
+    """
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, log_every: int = RESPONSE_CACHE_LOG_EVERY):
+        self.maxsize = maxsize
+        self.log_every = log_every
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, versions: Dict[str, int]) -> Optional[Any]:
+        with self._lock:
+            if versions != self._versions:
+                if self._data:
+                    self.invalidations += 1
+                self._data.clear()
+                self._versions = dict(versions)
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+            lookups = self.hits + self.misses
+        if self.log_every and lookups % self.log_every == 0:
+            print(f"[DEBUG] Response cache: {self.stats()}")
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data), "maxsize": self.maxsize,
+            "hits": self.hits, "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+RESPONSE_CACHE = ResponseCache()